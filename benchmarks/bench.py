@@ -0,0 +1,200 @@
+"""Benchmark suite for htmltabs merges.
+
+Generates synthetic report corpora, times merges of them in several modes
+(wall time and peak RSS of the htmltabs process), writes the results as
+JSON and compares a run against a stored baseline.
+
+    python benchmarks/bench.py run --output results.json
+    python benchmarks/bench.py compare baseline.json results.json
+"""
+import importlib.util
+import json
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from create_repro import generate_corpus  # noqa: E402
+
+app = typer.Typer()
+console = Console()
+
+# Corpus presets. Sizes are in bytes per file and are multiplied by --scale.
+CORPORA = {
+    "small": dict(num_files=20, file_size=50_000, asset_fraction=0.5, shared_ratio=0.8),
+    "many": dict(num_files=500, file_size=20_000, asset_fraction=0.3, shared_ratio=0.9),
+    "large": dict(num_files=10, file_size=5_000_000, asset_fraction=0.6, shared_ratio=0.9),
+    "unique": dict(num_files=50, file_size=500_000, asset_fraction=0.5, shared_ratio=0.0),
+    "nested": dict(num_files=200, file_size=50_000, asset_fraction=0.5, shared_ratio=0.8, depth=3),
+}
+
+# Extra htmltabs arguments for each benchmarked mode.
+MODES = {
+    "default": [],
+    "iframe": ["--iframe"],
+    "fast-parser": ["--parser", "fast"],
+    "lxml": ["--parser", "lxml"],
+    "minify": ["--minify"],
+}
+
+
+def ensure_corpus(work_dir: Path, name: str, scale: float) -> Path:
+    """Generate a corpus unless an identical one already exists in work_dir."""
+    spec = dict(CORPORA[name])
+    spec["file_size"] = int(spec["file_size"] * scale)
+    corpus_dir = work_dir / f"{name}-x{scale:g}"
+    spec_file = corpus_dir / "corpus.json"
+
+    if spec_file.exists() and json.loads(spec_file.read_text()) == spec:
+        return corpus_dir
+
+    console.print(f"Generating corpus [yellow]{name}[/yellow] in {corpus_dir}")
+    if corpus_dir.exists():
+        for path in sorted(corpus_dir.rglob("*"), reverse=True):
+            path.unlink() if path.is_file() else path.rmdir()
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    generate_corpus(str(corpus_dir), **spec)
+    spec_file.write_text(json.dumps(spec, sort_keys=True))
+    return corpus_dir
+
+
+def measure(args: List[str]) -> dict:
+    """Run a command, returning its wall time and peak RSS (including workers)."""
+    # Benchmark the working tree, not whatever htmltabs happens to be installed
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+
+    started = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+    _, status, rusage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{shlex.join(args)} failed: {process.stderr.read().decode(errors='replace')}")
+    process.stderr.close()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+    return {"wall_time_s": wall_time, "peak_rss_mb": peak_rss / (1024 * 1024)}
+
+
+@app.command()
+def run(
+    output: str = typer.Option("benchmark-results.json", "--output", "-o", help="Where to write the JSON results"),
+    corpora: Optional[List[str]] = typer.Option(None, "--corpus", help=f"Corpora to run (default: all of {', '.join(CORPORA)})"),
+    modes: Optional[List[str]] = typer.Option(None, "--mode", help=f"Modes to run (default: all of {', '.join(MODES)})"),
+    scale: float = typer.Option(1.0, "--scale", help="Multiply every corpus' file size by this factor"),
+    repeat: int = typer.Option(3, "--repeat", help="Runs per corpus/mode; the fastest time and largest RSS are kept"),
+    extra_args: str = typer.Option("", "--extra-args", help="Additional htmltabs arguments, e.g. '--jobs 4'"),
+    work_dir: str = typer.Option(".benchmarks", "--work-dir", help="Directory for generated corpora and outputs"),
+):
+    """Time merges of the synthetic corpora and write the results as JSON."""
+    corpora = corpora or list(CORPORA)
+    # lxml is optional; without it that mode would just repeat "default"
+    modes = modes or [mode for mode in MODES if mode != "lxml" or importlib.util.find_spec("lxml")]
+    for name in corpora:
+        if name not in CORPORA:
+            console.print(f"[red]Unknown corpus: {name}. Use: {', '.join(CORPORA)}[/red]")
+            raise typer.Exit(1)
+    for mode in modes:
+        if mode not in MODES:
+            console.print(f"[red]Unknown mode: {mode}. Use: {', '.join(MODES)}[/red]")
+            raise typer.Exit(1)
+
+    work_path = Path(work_dir)
+    results = []
+    for name in corpora:
+        corpus_dir = ensure_corpus(work_path, name, scale)
+        recursive = ["--recursive"] if CORPORA[name].get("depth") else []
+        for mode in modes:
+            output_file = work_path / f"{name}-{mode}.html"
+            args = [
+                sys.executable, "-m", "htmltabs", str(corpus_dir), str(output_file),
+                "--force", "--quiet", "--no-cache", *recursive, *MODES[mode], *shlex.split(extra_args),
+            ]
+            runs = [measure(args) for _ in range(repeat)]
+            result = {
+                "corpus": name,
+                "mode": mode,
+                "wall_time_s": min(r["wall_time_s"] for r in runs),
+                "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+                "output_bytes": output_file.stat().st_size,
+            }
+            results.append(result)
+            console.print(
+                f"{name:>8} {mode:<12} {result['wall_time_s']:8.3f}s {result['peak_rss_mb']:8.1f} MB"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": scale,
+            "repeat": repeat,
+            "extra_args": extra_args,
+        },
+        "results": results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+    console.print(f"📄 Results saved as: [blue]{output}[/blue]")
+
+
+@app.command()
+def compare(
+    baseline: str = typer.Argument(..., help="Baseline results JSON"),
+    current: str = typer.Argument(..., help="Current results JSON"),
+    max_time_regression: float = typer.Option(0.10, "--max-time-regression", help="Allowed relative wall time increase"),
+    max_rss_regression: float = typer.Option(0.10, "--max-rss-regression", help="Allowed relative peak RSS increase"),
+    min_time: float = typer.Option(0.05, "--min-time", help="Ignore time regressions smaller than this many seconds"),
+):
+    """Compare results against a baseline and fail on regressions."""
+    base = {(r["corpus"], r["mode"]): r for r in json.loads(Path(baseline).read_text())["results"]}
+    cur = {(r["corpus"], r["mode"]): r for r in json.loads(Path(current).read_text())["results"]}
+
+    table = Table(title="Benchmark comparison")
+    for column in ("Corpus", "Mode", "Time (base)", "Time (now)", "Δ time", "RSS (base)", "RSS (now)", "Δ RSS"):
+        table.add_column(column)
+
+    failures = 0
+    for key in sorted(base.keys() & cur.keys()):
+        b, c = base[key], cur[key]
+        time_delta = c["wall_time_s"] / b["wall_time_s"] - 1 if b["wall_time_s"] else 0.0
+        rss_delta = c["peak_rss_mb"] / b["peak_rss_mb"] - 1 if b["peak_rss_mb"] else 0.0
+
+        time_failed = time_delta > max_time_regression and c["wall_time_s"] - b["wall_time_s"] > min_time
+        rss_failed = rss_delta > max_rss_regression
+        failures += time_failed + rss_failed
+
+        table.add_row(
+            key[0], key[1],
+            f"{b['wall_time_s']:.3f}s", f"{c['wall_time_s']:.3f}s",
+            f"[{'red' if time_failed else 'green'}]{time_delta:+.1%}[/]",
+            f"{b['peak_rss_mb']:.1f} MB", f"{c['peak_rss_mb']:.1f} MB",
+            f"[{'red' if rss_failed else 'green'}]{rss_delta:+.1%}[/]",
+        )
+
+    console.print(table)
+    missing = sorted(base.keys() - cur.keys())
+    if missing:
+        console.print(f"[yellow]Not in current results: {', '.join('/'.join(k) for k in missing)}[/yellow]")
+
+    if failures:
+        console.print(f"[red]{failures} regression(s) beyond the allowed thresholds[/red]")
+        raise typer.Exit(1)
+    console.print("[green]No regressions[/green]")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,4 +1,5 @@
 import os
+import random
 
 def create_repro_files():
     os.makedirs("repro_data", exist_ok=True)
@@ -51,5 +52,121 @@ def create_repro_files():
         </html>
         """)
 
+def _filler_text(rng, size):
+    """Return roughly size characters of pseudo-random words."""
+    words = ["sample", "reads", "cells", "genes", "median", "umi", "mapped", "barcode",
+             "quality", "library", "fraction", "sequencing", "saturation", "cluster"]
+    chunks = []
+    total = 0
+    while total < size:
+        word = rng.choice(words)
+        chunks.append(word)
+        total += len(word) + 1
+    return " ".join(chunks)
+
+
+def _inline_script(rng, name, size):
+    """Return an inline <script> block of about size characters."""
+    lines = [f"// {name}"]
+    total = 0
+    while total < size:
+        line = f"var {name}_{len(lines)} = [{', '.join(str(rng.randint(0, 99999)) for _ in range(12))}];"
+        lines.append(line)
+        total += len(line) + 1
+    return "<script>\n" + "\n".join(lines) + "\n</script>"
+
+
+def _inline_style(rng, name, size):
+    """Return an inline <style> block of about size characters."""
+    rules = [f"/* {name} */"]
+    total = 0
+    while total < size:
+        rule = f".{name}-{len(rules)} {{ color: #{rng.randint(0, 0xFFFFFF):06x}; margin: {rng.randint(0, 40)}px; }}"
+        rules.append(rule)
+        total += len(rule) + 1
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+def _report_body(rng, index, size):
+    """Return body markup of about size characters: headings, tables and text."""
+    parts = [f"<h1>Report {index}</h1>"]
+    total = 0
+    while total < size:
+        rows = "".join(
+            f"<tr><td>{_filler_text(rng, 12)}</td><td>{rng.random():.4f}</td></tr>" for _ in range(8)
+        )
+        part = (
+            f'<div class="section"><h2>Section {len(parts)}</h2>'
+            f"<p>{_filler_text(rng, 300)}</p><table>{rows}</table></div>"
+        )
+        parts.append(part)
+        total += len(part)
+    return "\n".join(parts)
+
+
+def generate_corpus(
+    output_dir,
+    num_files=10,
+    file_size=50_000,
+    asset_fraction=0.5,
+    shared_ratio=0.8,
+    depth=0,
+    fanout=3,
+    seed=0,
+):
+    """Write a synthetic corpus of report-like HTML files.
+
+    Each file is about file_size bytes, of which asset_fraction is inline
+    JS/CSS. shared_ratio of those assets are identical in every file (like
+    the plotting bundles of tool-generated reports), the rest is unique per
+    file. With depth > 0, files are spread over a tree of subdirectories
+    depth levels deep with fanout children per directory, for --recursive.
+    Returns the list of written paths.
+    """
+    rng = random.Random(seed)
+    asset_size = int(file_size * asset_fraction)
+    shared_size = int(asset_size * shared_ratio)
+    unique_size = asset_size - shared_size
+    body_size = max(file_size - asset_size, 0)
+
+    # Shared blocks are generated once with their own seed so every file gets identical copies
+    shared_rng = random.Random(seed + 1)
+    shared_assets = ""
+    if shared_size:
+        shared_assets = (
+            _inline_style(shared_rng, "shared", shared_size // 4)
+            + _inline_script(shared_rng, "sharedBundle", shared_size - shared_size // 4)
+        )
+
+    paths = []
+    for i in range(num_files):
+        subdir = output_dir
+        node = i
+        for _ in range(depth):
+            subdir = os.path.join(subdir, f"level_{node % fanout}")
+            node //= fanout
+        os.makedirs(subdir, exist_ok=True)
+
+        unique_assets = ""
+        if unique_size:
+            unique_assets = (
+                _inline_style(rng, f"report{i}", unique_size // 4)
+                + _inline_script(rng, f"report{i}", unique_size - unique_size // 4)
+            )
+
+        path = os.path.join(subdir, f"report_{i:05d}.html")
+        with open(path, "w") as f:
+            f.write(
+                "<!DOCTYPE html>\n<html>\n<head>\n"
+                f"<meta charset=\"utf-8\">\n<title>Report {i}</title>\n"
+                f"{shared_assets}\n{unique_assets}\n"
+                "</head>\n<body>\n"
+                f"{_report_body(rng, i, body_size)}\n"
+                "</body>\n</html>\n"
+            )
+        paths.append(path)
+    return paths
+
+
 if __name__ == "__main__":
     create_repro_files()
@@ -0,0 +1,3 @@
+from .htmltabs import MergeOptions, MergeResult, Tab, TabMerger
+
+__all__ = ["MergeOptions", "MergeResult", "Tab", "TabMerger"]
@@ -0,0 +1,3 @@
+from .htmltabs import app
+
+app(prog_name="htmltabs")
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+# Bump whenever the shape of cached extraction results changes.
+CACHE_VERSION = 1
+
+
+class BuildCache:
+    """On-disk cache of per-file extraction results, keyed by content hash.
+
+    Entries are small JSON files fanned out over two-character
+    subdirectories. Reading an entry refreshes its mtime, so ``prune`` can
+    evict the least recently used entries once the cache grows past
+    ``max_bytes``. Instances are picklable so worker processes can share them.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, options: Optional[Dict[str, Any]] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Options that change what extraction produces are folded into every key
+        self._salt = json.dumps({"version": CACHE_VERSION, **(options or {})}, sort_keys=True).encode('utf-8')
+
+    def key(self, data: bytes) -> str:
+        """Return the cache key for a file's raw bytes."""
+        digest = hashlib.sha256(self._salt)
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value under key."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def prune(self) -> int:
+        """Evict least recently used entries until the cache fits in max_bytes.
+
+        Returns the number of entries removed.
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".json"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -1,45 +1,505 @@
 from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+import hashlib
+from collections import Counter, deque
+from collections.abc import Sequence
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from functools import partial
+import html
+from html.parser import HTMLParser
+import io
+import itertools
+import base64
+import codecs
+import gzip
+import json
+import multiprocessing
 import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 import typer
+from typer.core import TyperGroup
 from rich.console import Console
-from typing import Optional, List
-import glob
+from rich.table import Table
+from urllib.parse import quote, unquote
+from typing import IO, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, List, Tuple, TypeVar, Union
 from pathlib import Path
 
-app = typer.Typer()
+from .cache import BuildCache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+class DefaultCommandGroup(TyperGroup):
+    """Command group that runs merge-html when no command is named.
+
+    Keeps ``htmltabs DIRECTORY [OUTPUT_FILE]`` working next to subcommands
+    such as ``htmltabs watch``.
+    """
+
+    default_command = "merge-html"
+
+    def parse_args(self, ctx, args):
+        group_options = {opt for param in self.get_params(ctx) for opt in param.opts}
+        if args and args[0] not in self.commands and args[0] not in group_options:
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(cls=DefaultCommandGroup)
 console = Console()
 
+# Static pieces of the merged document, written around the streamed content.
+HTML_SHELL_START = """
+<html>
+<head>
+<meta charset="utf-8"/>
+<meta content="width=device-width, initial-scale=1.0" name="viewport"/>
+<title>Merged HTML Tabs</title>
+"""
+
+HTML_SHELL_BODY = """</head>
+<body>
+<div id="tab-container">
+<div id="tab-buttons">"""
+
+HTML_SHELL_CONTENTS = """</div>
+<div id="tab-contents">"""
+
+TAB_SCRIPT = """
+    const tabActivationHooks = [];
+    const tabButtons = document.getElementById('tab-buttons');
+    // Only the active tab and button are tracked, so switching never scans every tab
+    let currentTab = document.querySelector('.tab.active');
+    let currentButton = null;
+    // Returns the rendered button of a tab, if any; replaced by the virtual tab list
+    let findTabButton = tabId => tabButtons.children[Number(tabId.slice(3)) - 1] || null;
+
+    function showTab(tabId, button) {
+        const tab = document.getElementById(tabId);
+        if (!tab) return;
+        tabActivationHooks.forEach(hook => hook(tab));
+        if (currentTab) currentTab.classList.remove('active');
+        if (currentButton) currentButton.classList.remove('active');
+        tab.classList.add('active');
+        if (button) button.classList.add('active');
+        currentTab = tab;
+        currentButton = button;
+    }
+
+    // Deep links: merged.html#tab7 opens the seventh tab
+    function showTabFromHash() {
+        const tabId = decodeURIComponent(location.hash.slice(1));
+        const tab = tabId && document.getElementById(tabId);
+        if (tab && tab.classList.contains('tab') && tab !== currentTab) showTab(tabId, findTabButton(tabId));
+    }
+
+    tabButtons.addEventListener('click', event => {
+        const button = event.target.closest('[data-tab]');
+        if (!button) return;
+        showTab(button.dataset.tab, button);
+        try {
+            history.replaceState(null, '', '#' + button.dataset.tab);
+        } catch (e) {
+            // Some browsers refuse history changes for file:// pages
+        }
+    });
+    window.addEventListener('hashchange', showTabFromHash);
+    document.addEventListener("DOMContentLoaded", () => {
+        currentButton = currentTab && findTabButton(currentTab.id);
+        if (currentButton) currentButton.classList.add('active');
+        showTabFromHash();
+    });
+    """
+
+def render_footer(script: str = TAB_SCRIPT) -> str:
+    """Return the closing part of the document, including the tab scripts.
+
+    The scripts run in their own function scope so that their names cannot clash
+    with those of inlined pages; only showTab is made global.
+    """
+    return f"""</div>
+</div>
+<script>(() => {{{script}
+window.showTab = showTab;
+}})();</script></body>
+</html>
+"""
+
+# Iframes whose document is kept in data-srcdoc get it assigned by script,
+# either right away or, in lazy mode, when their tab is first shown.
+SRCDOC_SCRIPT = """
+    async function expandSrcdoc(doc) { return doc; }
+    """
+
+# Decodes stored payloads: JSON strings, or gzip+base64 with --compress.
+PAYLOAD_SCRIPT = """
+    async function readPayload(el) {
+        if (el.type !== 'application/x-gzip-base64') return JSON.parse(el.textContent);
+        const response = await fetch('data:application/octet-stream;base64,' + el.textContent);
+        return new Response(response.body.pipeThrough(new DecompressionStream('gzip'))).text();
+    }
+    """
+
+# Rebuilds iframe documents whose shared script/style blocks were replaced by
+# markers, using the single copy of each block stored in the page.
+SHARED_ASSET_SCRIPT = """
+    const assetMarker = /<!--htmltabs-asset:([0-9a-f]+)-->/g;
+    const sharedAssets = {};
+    function loadSharedAsset(digest) {
+        if (!(digest in sharedAssets)) {
+            sharedAssets[digest] = readPayload(
+                document.querySelector(`script.htmltabs-asset[data-digest="${digest}"]`));
+        }
+        return sharedAssets[digest];
+    }
+    async function expandSrcdoc(doc) {
+        const assets = {};
+        for (const [, digest] of doc.matchAll(assetMarker)) {
+            assets[digest] = await loadSharedAsset(digest);
+        }
+        return doc.replace(assetMarker, (marker, digest) => assets[digest]);
+    }
+    """
+
+EAGER_SRCDOC_SCRIPT = """
+    document.querySelectorAll('iframe[data-srcdoc]').forEach(async iframe => {
+        iframe.srcdoc = await expandSrcdoc(iframe.dataset.srcdoc);
+        iframe.removeAttribute('data-srcdoc');
+    });
+    """
+
+# Attaches inert tab content (<template>, data-srcdoc or a compressed payload)
+# on first activation and unloads the least recently used iframes beyond
+# maxLiveIframes.
+LAZY_TAB_SCRIPT = """
+    const liveIframes = [];
+    async function materializeTab(tab) {
+        const payload = tab.querySelector(':scope > script.htmltabs-payload');
+        if (payload) {
+            payload.remove();
+            const content = await readPayload(payload);
+            const frame = tab.querySelector(':scope > iframe');
+            if (frame) {
+                frame.dataset.srcdoc = content;
+            } else {
+                const range = document.createRange();
+                range.selectNodeContents(tab);
+                tab.append(range.createContextualFragment(content));
+            }
+        }
+
+        // Imported copies (unlike moved nodes) get their scripts executed
+        const template = tab.querySelector(':scope > template');
+        if (template) template.replaceWith(document.importNode(template.content, true));
+
+        const iframe = tab.querySelector(':scope > iframe[data-srcdoc]');
+        if (!iframe) return;
+        if (!iframe.hasAttribute('srcdoc')) iframe.srcdoc = await expandSrcdoc(iframe.dataset.srcdoc);
+
+        const index = liveIframes.indexOf(iframe);
+        if (index !== -1) liveIframes.splice(index, 1);
+        liveIframes.push(iframe);
+        while (maxLiveIframes > 0 && liveIframes.length > maxLiveIframes) {
+            liveIframes.shift().removeAttribute('srcdoc');
+        }
+    }
+    tabActivationHooks.push(materializeTab);
+    if (currentTab) materializeTab(currentTab);
+    """
+
+# Renders only the visible rows of a long tab list and filters it by name and path.
+VIRTUAL_TAB_SCRIPT = """
+    const tabIndex = JSON.parse(document.getElementById('tab-index').textContent);
+    const tabSearchText = tabIndex.map(([name, title]) => (name + '\\n' + title).toLowerCase());
+    const tabList = document.getElementById('tab-list');
+    const tabListSpacer = document.getElementById('tab-list-spacer');
+    const tabRows = document.getElementById('tab-rows');
+    const rowHeight = 40;
+    const overscanRows = 10;
+    let visibleTabs = tabIndex.map((_, index) => index);
+    let lastQuery = '';
+
+    function renderTabRows() {
+        tabListSpacer.style.height = visibleTabs.length * rowHeight + 'px';
+        const first = Math.max(0, Math.floor(tabList.scrollTop / rowHeight) - overscanRows);
+        const last = Math.min(
+            visibleTabs.length,
+            Math.ceil((tabList.scrollTop + tabList.clientHeight) / rowHeight) + overscanRows
+        );
+        const buttons = [];
+        currentButton = null;
+        for (let i = first; i < last; i++) {
+            const [name, title] = tabIndex[visibleTabs[i]];
+            const button = document.createElement('button');
+            button.className = 'tab-button';
+            button.dataset.tab = 'tab' + (visibleTabs[i] + 1);
+            button.title = title;
+            button.textContent = name;
+            if (currentTab && button.dataset.tab === currentTab.id) {
+                button.classList.add('active');
+                currentButton = button;
+            }
+            buttons.push(button);
+        }
+        tabRows.style.transform = `translateY(${first * rowHeight}px)`;
+        tabRows.replaceChildren(...buttons);
+    }
+
+    findTabButton = tabId => {
+        const row = visibleTabs.indexOf(Number(tabId.slice(3)) - 1);
+        if (row === -1) return null;
+        const top = row * rowHeight;
+        if (top < tabList.scrollTop || top + rowHeight > tabList.scrollTop + tabList.clientHeight) {
+            tabList.scrollTop = top - (tabList.clientHeight - rowHeight) / 2;
+        }
+        renderTabRows();
+        return tabRows.querySelector(`[data-tab="${tabId}"]`);
+    };
+
+    document.getElementById('tab-filter').addEventListener('input', event => {
+        const query = event.target.value.trim().toLowerCase();
+        // A longer query only needs to search the previous matches
+        const candidates = query.startsWith(lastQuery) ? visibleTabs : tabIndex.map((_, index) => index);
+        visibleTabs = candidates.filter(index => tabSearchText[index].includes(query));
+        lastQuery = query;
+        tabList.scrollTop = 0;
+        renderTabRows();
+    });
+
+    let renderPending = false;
+    function scheduleRender() {
+        if (renderPending) return;
+        renderPending = true;
+        requestAnimationFrame(() => {
+            renderPending = false;
+            renderTabRows();
+        });
+    }
+    tabList.addEventListener('scroll', scheduleRender);
+    window.addEventListener('resize', scheduleRender);
+    renderTabRows();
+    """
+
+IFRAME_STYLES = """
+        #tab-contents { overflow: hidden; display: flex; flex-direction: column; }
+        .tab { flex: 1; display: none; flex-direction: column; padding: 0; }
+        .tab.active { display: flex; }
+        .tab-iframe { width: 100%; height: 100%; border: none; flex: 1; }
+        """
+
+VIRTUAL_TAB_STYLES = """
+        #tab-buttons { flex-direction: column; flex-wrap: nowrap; min-height: 0; }
+        #tab-filter { padding: 8px; font: inherit; color: inherit; background: transparent; border: 1px solid #ccc; border-radius: 4px; }
+        #tab-list { overflow-y: auto; flex: 1; min-height: 0; }
+        #tab-list-spacer { position: relative; }
+        #tab-rows { position: absolute; top: 0; left: 0; right: 0; }
+        #tab-rows .tab-button {
+            display: block; box-sizing: border-box; width: 100%; height: 36px; margin: 0 0 4px;
+            padding-top: 0; padding-bottom: 0; line-height: 36px; text-align: left;
+            white-space: nowrap; overflow: hidden; text-overflow: ellipsis; transform: none;
+        }
+        """
+
+INDEX_STYLES = """
+        .index-shard { margin-bottom: 24px; }
+        .index-links { display: flex; gap: 8px; flex-wrap: wrap; }
+        a.tab-button { display: inline-block; text-decoration: none; }
+        """
+
+INDEX_SHELL_END = """</div>
+</div>
+</body>
+</html>
+"""
+
+IFRAME_ATTRS = 'class="tab-iframe" frameborder="0" sandbox="allow-scripts allow-same-origin allow-popups allow-forms"'
+
+# Characters read per step when streaming a file into an iframe srcdoc.
+SRCDOC_CHUNK_SIZE = 1024 * 1024
+
+# Parsers accepted by --parser; "fast" is the tokenizer pass in scan_html.
+PARSERS = ("html.parser", "lxml", "fast")
+BODY_END_RE = re.compile(r"</body\s*>", re.IGNORECASE)
+HTML_END_RE = re.compile(r"</html\s*>", re.IGNORECASE)
+
+# Spooled tab contents stay in memory up to this size before moving to a temporary file.
+SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+
+# Inline script/style blocks considered for sharing between iframe tabs.
+ASSET_BLOCK_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+SHARED_ASSET_MIN_SIZE = 1024
+
+# --minify copies the contents of these elements verbatim, and drops whitespace
+# next to the block-level tags, where it never renders.
+MINIFY_RAW_TAGS = ("pre", "textarea", "script", "style")
+MINIFY_BLOCK_TAGS = frozenset((
+    "!doctype address article aside base blockquote body caption col colgroup dd details dialog div dl dt "
+    "fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 head header hgroup hr html legend li link main "
+    "menu meta nav ol optgroup option p pre section summary table tbody td tfoot th thead title tr ul"
+).split())
+# A complete tag; quoted attribute values may contain ">"
+MINIFY_TAG_RE = re.compile(r"""<[/!?]?[A-Za-z][^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>""")
+MINIFY_TAG_NAME_RE = re.compile(r"</?([A-Za-z!][^\s/>]*)")
+MINIFY_TAG_START_RE = re.compile(r"</?[A-Za-z][^\s/>]*(?=[\s/>])")
+# The end of a chunk that may still become a tag or comment
+MINIFY_PARTIAL_TAG_RE = re.compile(r"<(?:/?[A-Za-z][^\s/>]*|/|[!?][^>]*)?\Z")
+MINIFY_TAG_STOP_RE = re.compile(r"""=[ \t\n\r\f]*(["'])|>""")
+MINIFY_SPECIAL_RE = re.compile(rf"<!--|<({'|'.join(MINIFY_RAW_TAGS)})(?=[\s/>])", re.IGNORECASE)
+# Text and complete tags up to the next comment, raw element or incomplete tag.
+# Tags are consumed whole, so "<!--" or "<script" inside a quoted attribute
+# value is never mistaken for one.
+MINIFY_TEXT_RE = re.compile(
+    rf"""(?:[^<]++|<(?!!--|(?i:{'|'.join(MINIFY_RAW_TAGS)})(?=[\s/>]))[/!?]?[A-Za-z]"""
+    r"""[^>"']*+(?:(?:"[^"]*+"|'[^']*+')[^>"']*+)*+>|<(?![/!?]?[A-Za-z]|!--))*+"""
+)
+MINIFY_RAW_END_RE = {tag: re.compile(rf"</{tag}(?=[\s/>])", re.IGNORECASE) for tag in MINIFY_RAW_TAGS}
+# Tags with the whitespace after them, and the whitespace that may shrink:
+# runs of two or more, tabs and newlines, and spaces before a tag. Every branch
+# starts with one of "< \t\n\r\f", which keeps the scan fast.
+MINIFY_MARKUP_RE = re.compile(
+    rf"""[< \t\n\r\f](?:(?<=<){MINIFY_TAG_RE.pattern[1:]}[ \t\n\r\f]*"""
+    r"""|(?<=[ \t\n\r\f])[ \t\n\r\f]+|(?<=[\t\n\r\f])|(?<= )(?=<))"""
+)
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+
+# Parameters shared by merge-html and watch
+DIRECTORY_ARGUMENT = typer.Argument(..., help="Directory containing HTML files")
+OUTPUT_FILE_ARGUMENT = typer.Argument("merged.html", help="Name of the merged HTML output file")
+PATTERN_OPTION = typer.Option(["*.html"], "--pattern", "-p", help="File pattern to match (e.g., '*.html', '*.htm'; can be used multiple times)")
+EXCLUDE_OPTION = typer.Option(None, "--exclude", "-e", help="Patterns to exclude (can be used multiple times)")
+RECURSIVE_OPTION = typer.Option(False, "--recursive", "-r", help="Scan directories recursively")
+PRUNE_EXCLUDED_OPTION = typer.Option(False, "--prune-excluded", help="Skip directories matching an exclude pattern entirely when scanning recursively")
+SORT_BY_OPTION = typer.Option("name", "--sort-by", "-s", help="Sort files by: name, size, date, or none")
+REVERSE_OPTION = typer.Option(False, "--reverse", help="Reverse the sort order")
+CUSTOM_CSS_OPTION = typer.Option(None, "--custom-css", "-c", help="Path to custom CSS file to include")
+THEME_OPTION = typer.Option("default", "--theme", "-t", help="Built-in theme: default, dark, minimal")
+TAB_POSITION_OPTION = typer.Option("top", "--tab-position", help="Tab position: top, bottom, left, right")
+VERBOSE_OPTION = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
+QUIET_OPTION = typer.Option(False, "--quiet", "-q", help="Suppress all output except errors")
+FULL_PATH_OPTION = typer.Option(False, "--full-path", help="Use full file path as tab name instead of just filename")
+STRIP_EXT_OPTION = typer.Option(True, "--strip-ext/--keep-ext", help="Strip file extensions from tab names")
+IFRAME_OPTION = typer.Option(False, "--iframe", help="Embed files using iframes (better for complex reports with JS/CSS)")
+LAZY_OPTION = typer.Option(False, "--lazy", help="Only attach a tab's content when it is first shown")
+MINIFY_OPTION = typer.Option(False, "--minify", help="Collapse insignificant whitespace and strip comments, leaving <pre>, <textarea>, <script> and <style> contents alone")
+MAX_LIVE_IFRAMES_OPTION = typer.Option(0, "--max-live-iframes", help="With --lazy --iframe, unload the least recently used iframes beyond this many (0 = unlimited)")
+VIRTUAL_TABS_OPTION = typer.Option(200, "--virtual-tabs", help="Show a searchable, virtualized tab list instead of buttons above this many tabs (0 = never)")
+JOBS_OPTION = typer.Option(1, "--jobs", "-j", help="Number of worker processes used to parse files (0 = all cores)")
+PARSER_OPTION = typer.Option("html.parser", "--parser", help="HTML parser for inline tabs: html.parser, lxml (if installed) or fast")
+
+
+def cli_options(quiet: bool, verbose: bool, **fields) -> Tuple["MergeOptions", Callable[..., None], Callable[..., None]]:
+    """Validate the options merge-html and watch share and build their MergeOptions.
+
+    Returns the options with the log and verbose_log functions that honour
+    --quiet and --verbose. Invalid values print an error and exit.
+    """
+    if quiet and verbose:
+        console.print("[red]Error: Cannot use both --quiet and --verbose flags[/red]")
+        raise typer.Exit(1)
+
+    def log(message: str, style: str = ""):
+        if not quiet:
+            console.print(message, style=style)
+
+    def verbose_log(message: str, style: str = ""):
+        if verbose and not quiet:
+            console.print(message, style=style)
+
+    options = MergeOptions(**fields)
+    if options.share_assets and not options.use_iframe:
+        console.print("[yellow]Warning: --share-assets only applies to --iframe mode[/yellow]")
+
+    if options.max_live_iframes < 0:
+        console.print("[red]Error: --max-live-iframes must be 0 (unlimited) or a positive number[/red]")
+        raise typer.Exit(1)
+    if options.max_live_iframes and not (options.lazy_tabs and options.use_iframe):
+        console.print("[yellow]Warning: --max-live-iframes only applies with --lazy --iframe[/yellow]")
+
+    if options.virtual_tabs < 0:
+        console.print("[red]Error: --virtual-tabs must be 0 (never) or a positive number[/red]")
+        raise typer.Exit(1)
+    if options.jobs < 0:
+        console.print("[red]Error: --jobs must be 0 (all cores) or a positive number[/red]")
+        raise typer.Exit(1)
+    options.jobs = options.jobs or os.cpu_count() or 1
+
+    try:
+        resolved_parser = available_parser(options.parser)
+    except ValueError:
+        console.print(f"[red]Invalid parser: {options.parser}. Use: {', '.join(PARSERS)}[/red]")
+        raise typer.Exit(1)
+    if resolved_parser != options.parser:
+        console.print(f"[yellow]Warning: {options.parser} is not installed, using {resolved_parser}[/yellow]")
+        options.parser = resolved_parser
+    if options.parser != "html.parser" and options.use_iframe:
+        console.print("[yellow]Warning: --parser only applies to inline tabs; --iframe embeds files unparsed[/yellow]")
+    return options, log, verbose_log
+
+
 @app.command()
 def merge_html(
-    directory_path: str = typer.Argument(..., help="Directory containing HTML files"),
-    output_file: str = typer.Argument("merged.html", help="Name of the merged HTML output file"),
+    directory_path: str = DIRECTORY_ARGUMENT,
+    output_file: str = OUTPUT_FILE_ARGUMENT,
     
     # File filtering options
-    pattern: str = typer.Option("*.html", "--pattern", "-p", help="File pattern to match (e.g., '*.html', '*.htm')"),
-    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-e", help="Patterns to exclude (can be used multiple times)"),
-    recursive: bool = typer.Option(False, "--recursive", "-r", help="Scan directories recursively"),
+    pattern: List[str] = PATTERN_OPTION,
+    exclude: Optional[List[str]] = EXCLUDE_OPTION,
+    recursive: bool = RECURSIVE_OPTION,
+    prune_excluded: bool = PRUNE_EXCLUDED_OPTION,
     
     # Sorting and organization
-    sort_by: str = typer.Option("name", "--sort-by", "-s", help="Sort files by: name, size, date, or none"),
-    reverse_sort: bool = typer.Option(False, "--reverse", help="Reverse the sort order"),
+    sort_by: str = SORT_BY_OPTION,
+    reverse_sort: bool = REVERSE_OPTION,
     
     # Styling and customization
-    custom_css: Optional[str] = typer.Option(None, "--custom-css", "-c", help="Path to custom CSS file to include"),
-    theme: str = typer.Option("default", "--theme", "-t", help="Built-in theme: default, dark, minimal"),
-    tab_position: str = typer.Option("top", "--tab-position", help="Tab position: top, bottom, left, right"),
+    custom_css: Optional[str] = CUSTOM_CSS_OPTION,
+    theme: str = THEME_OPTION,
+    tab_position: str = TAB_POSITION_OPTION,
     
     # Output control
-    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
-    quiet: bool = typer.Option(False, "--quiet", "-q", help="Suppress all output except errors"),
+    verbose: bool = VERBOSE_OPTION,
+    quiet: bool = QUIET_OPTION,
     preview: bool = typer.Option(False, "--preview", help="Show what files would be processed without creating output"),
     force: bool = typer.Option(False, "--force", "-f", help="Overwrite output file if it exists"),
     
     # Tab naming
-    use_full_path: bool = typer.Option(False, "--full-path", help="Use full file path as tab name instead of just filename"),
-    strip_extensions: bool = typer.Option(True, "--strip-ext/--keep-ext", help="Strip file extensions from tab names"),
+    use_full_path: bool = FULL_PATH_OPTION,
+    strip_extensions: bool = STRIP_EXT_OPTION,
     
     # Advanced options
-    use_iframe: bool = typer.Option(False, "--iframe", help="Embed files using iframes (better for complex reports with JS/CSS)")
+    use_iframe: bool = IFRAME_OPTION,
+    share_assets: bool = typer.Option(False, "--share-assets", help="Store inline scripts/styles shared by several iframe tabs only once"),
+    lazy: bool = LAZY_OPTION,
+    compress: bool = typer.Option(False, "--compress", help="Store tab contents gzip-compressed and decompress them in the browser (implies --lazy)"),
+    minify: bool = MINIFY_OPTION,
+    max_live_iframes: int = MAX_LIVE_IFRAMES_OPTION,
+    virtual_tabs: int = VIRTUAL_TABS_OPTION,
+    jobs: int = JOBS_OPTION,
+    parser: str = PARSER_OPTION,
+
+    # Build cache
+    cache_dir: str = typer.Option(".htmltabs-cache", "--cache-dir", help="Directory for cached per-file extraction results"),
+    cache_size: int = typer.Option(1024, "--cache-size", help="Maximum size of the build cache in MB"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Disable the build cache"),
+
+    # Sharding
+    max_output_size: Optional[str] = typer.Option(None, "--max-output-size", help="Split the output into several files of about this size (e.g. 500M, 2G)"),
+    max_tabs_per_file: int = typer.Option(0, "--max-tabs-per-file", help="Split the output into several files with at most this many tabs (0 = unlimited)"),
+
+    # Profiling
+    profile: bool = typer.Option(False, "--profile", help="Print the time and peak memory of each merge phase and the slowest files"),
+    stats_json: Optional[str] = typer.Option(None, "--stats-json", help="Write per-phase and per-file stats to this JSON file"),
 ):
     """
     Merge HTML files into a single HTML file with tabs.
@@ -48,218 +508,1840 @@ def merge_html(
     HTML file with a tabbed interface for easy navigation between the original files.
     """
     
-    if quiet and verbose:
-        console.print("[red]Error: Cannot use both --quiet and --verbose flags[/red]")
-        raise typer.Exit(1)
-    
-    def log(message: str, style: str = ""):
-        if not quiet:
-            console.print(message, style=style)
-    
-    def verbose_log(message: str, style: str = ""):
-        if verbose and not quiet:
-            console.print(message, style=style)
+    options, log, verbose_log = cli_options(
+        quiet,
+        verbose,
+        theme=theme,
+        tab_position=tab_position,
+        custom_css=custom_css,
+        use_full_path=use_full_path,
+        strip_extensions=strip_extensions,
+        use_iframe=use_iframe,
+        share_assets=share_assets,
+        lazy=lazy,
+        compress=compress,
+        minify=minify,
+        max_live_iframes=max_live_iframes,
+        virtual_tabs=virtual_tabs,
+        jobs=jobs,
+        parser=parser,
+    )
     
     # Check if output file exists
     if os.path.exists(output_file) and not force and not preview:
         console.print(f"[red]Error: Output file '{output_file}' already exists. Use --force to overwrite.[/red]")
         raise typer.Exit(1)
     
+    # Phase memory is measured with tracemalloc, which slows allocations down
+    options.trace_memory = profile
+    if options.trace_memory:
+        tracemalloc.start()
+    discovery_memory = {}
+
+    started = time.perf_counter()
     log(f"📂 Scanning directory: [yellow]{directory_path}[/yellow]")
     
-    # Build file list
-    if recursive:
-        pattern_path = os.path.join(directory_path, "**", pattern)
-        files = glob.glob(pattern_path, recursive=True)
-    else:
-        pattern_path = os.path.join(directory_path, pattern)
-        files = glob.glob(pattern_path)
-    
-    # Apply exclusions
-    if exclude:
-        original_count = len(files)
-        for exclude_pattern in exclude:
-            if recursive:
-                exclude_path = os.path.join(directory_path, "**", exclude_pattern)
-                exclude_files = set(glob.glob(exclude_path, recursive=True))
-            else:
-                exclude_path = os.path.join(directory_path, exclude_pattern)
-                exclude_files = set(glob.glob(exclude_path))
-            files = [f for f in files if f not in exclude_files]
-        
-        excluded_count = original_count - len(files)
-        if excluded_count > 0:
-            verbose_log(f"Excluded {excluded_count} files based on exclusion patterns")
-    
-    if not files:
-        console.print(f"[red]No files found matching pattern '{pattern}' in {directory_path}[/red]")
+    # Build file list in a single directory walk; the stat results are kept
+    # for sorting, previews and shard planning.
+    try:
+        with traced_phase("discovery", discovery_memory):
+            discovered, excluded_count = discover_files(directory_path, pattern, exclude or [], recursive, prune_excluded)
+    except OSError:
+        discovered, excluded_count = [], 0
+    # A previous run's output in the scanned directory is not a report
+    discovered = skip_paths(discovered, [output_file])
+
+    if excluded_count > 0:
+        verbose_log(f"Excluded {excluded_count} files based on exclusion patterns")
+
+    if not discovered:
+        console.print(f"[red]No files found matching pattern '{', '.join(pattern)}' in {directory_path}[/red]")
         raise typer.Exit(1)
-    
+
     # Sort files
-    if sort_by == "name":
-        files.sort(key=os.path.basename, reverse=reverse_sort)
-    elif sort_by == "size":
-        files.sort(key=lambda f: os.path.getsize(f), reverse=reverse_sort)
-    elif sort_by == "date":
-        files.sort(key=lambda f: os.path.getmtime(f), reverse=reverse_sort)
-    elif sort_by == "none":
-        pass  # Keep original order
-    else:
+    try:
+        sort_discovered(discovered, sort_by, reverse_sort)
+    except ValueError:
         console.print(f"[red]Invalid sort option: {sort_by}. Use: name, size, date, or none[/red]")
         raise typer.Exit(1)
+
+    files = [filepath for filepath, _ in discovered]
+    file_sizes = [st.st_size for _, st in discovered]
+    discovery_time = time.perf_counter() - started
     
     log(f"Found {len(files)} HTML files")
+
+    # Split the output when it would exceed the size or tab budget
+    try:
+        max_output_bytes = parse_size(max_output_size) if max_output_size else 0
+    except ValueError:
+        console.print(f"[red]Error: Invalid --max-output-size: {max_output_size}. Use e.g. 500M or 2G[/red]")
+        raise typer.Exit(1)
+    if max_tabs_per_file < 0:
+        console.print("[red]Error: --max-tabs-per-file must be 0 (unlimited) or a positive number[/red]")
+        raise typer.Exit(1)
+
+    shards = [files]
+    shard_files = [output_file]
+    if max_output_bytes or max_tabs_per_file:
+        shards = plan_shards(files, file_sizes, max_tabs_per_file, max_output_bytes)
+        if len(shards) > 1:
+            shard_files = shard_file_names(output_file, len(shards))
+            existing = [f for f in shard_files if os.path.exists(f)]
+            if existing and not force and not preview:
+                console.print(f"[red]Error: Output file '{existing[0]}' already exists. Use --force to overwrite.[/red]")
+                raise typer.Exit(1)
     
     if preview:
         log("\n[blue]Preview - Files that would be processed:[/blue]")
-        for i, filepath in enumerate(files, 1):
+        for i, (filepath, size) in enumerate(zip(files, file_sizes), 1):
             rel_path = os.path.relpath(filepath, directory_path)
-            size = os.path.getsize(filepath)
             log(f"  {i:3d}. {rel_path} ({size:,} bytes)")
-        log(f"\n[blue]Output would be saved to: {output_file}[/blue]")
-        return
-    
-    # Initialize merged HTML structure
-    merged_soup = BeautifulSoup("""
-    <html>
-      <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Merged HTML Tabs</title>
-      </head>
-      <body>
-        <div id="tab-container">
-          <div id="tab-buttons"></div>
-          <div id="tab-contents"></div>
-        </div>
-      </body>
-    </html>
-    """, 'html.parser')
-
-    # Deduplicate styles/scripts (only if not using iframes)
-    if not use_iframe:
-        seen_blocks = set()
-        for filepath in files:
-            verbose_log(f"Scanning for styles/scripts: [dim]{os.path.relpath(filepath, directory_path)}[/dim]")
-            with open(filepath, "r", encoding='utf-8', errors='ignore') as f:
-                soup = BeautifulSoup(f.read(), 'html.parser')
-                if soup.head:
-                    for tag in soup.head.find_all(["style", "link", "script"]):
-                        tag_str = str(tag)
-                        if tag_str not in seen_blocks:
-                            merged_soup.head.append(tag)
-                            seen_blocks.add(tag_str)
-
-    # Process each file
-    for i, filepath in enumerate(files):
-        rel_path = os.path.relpath(filepath, directory_path)
-        log(f"✅ Processing: [green]{rel_path}[/green]")
-
-        with open(filepath, "r", encoding='utf-8', errors='ignore') as f:
-            soup = BeautifulSoup(f.read(), 'html.parser')
-
-        tab_id = f"tab{i+1}"
-        tab_class = "tab active" if i == 0 else "tab"
-        content_div = merged_soup.new_tag("div", id=tab_id, **{"class": tab_class})
-
-        if use_iframe:
-             # Use iframe with srcdoc
-            with open(filepath, "r", encoding='utf-8', errors='ignore') as f:
-                file_content = f.read()
-            
-            # Create iframe
-            iframe = merged_soup.new_tag("iframe", srcdoc=file_content, **{
-                "class": "tab-iframe",
-                "frameborder": "0",
-                "sandbox": "allow-scripts allow-same-origin allow-popups allow-forms"
-            })
-            content_div.append(iframe)
-        else:
-            # Extract body content or entire content if no body tag
-            content_html = ""
-            if soup.body:
-                content_html = "".join(str(element) for element in soup.body.contents if str(element).strip())
-            else:
-                content_html = "".join(str(element) for element in soup.contents if str(element).strip())
-            
-            # Parse and append the content
-            if content_html.strip():
-                parsed_content = BeautifulSoup(content_html, 'html.parser')
-                for element in parsed_content:
-                    if str(element).strip():
-                        content_div.append(element)
-
-        merged_soup.select_one("#tab-contents").append(content_div)
-
-        # Generate tab name
-        if use_full_path:
-            tab_name = rel_path
+        if len(shards) > 1:
+            log(f"\n[blue]Output would be split into {len(shards)} files ({shard_files[0]} ... {shard_files[-1]}) with an index page at {output_file}[/blue]")
         else:
-            tab_name = os.path.basename(filepath)
-        
-        if strip_extensions:
-            tab_name = os.path.splitext(tab_name)[0]
-
-        button = merged_soup.new_tag("button", **{
-            "class": "tab-button",
-            "onclick": f"showTab('{tab_id}', this)",
-            "title": rel_path  # Add tooltip with full path
-        })
-        button.string = tab_name
-        merged_soup.select_one("#tab-buttons").append(button)
-
-    # Add custom CSS if provided
-    if custom_css and os.path.exists(custom_css):
-        verbose_log(f"Including custom CSS from: {custom_css}")
-        with open(custom_css, "r", encoding='utf-8') as f:
-            custom_style = merged_soup.new_tag("style")
-            custom_style.string = f.read()
-            merged_soup.head.append(custom_style)
-    elif custom_css:
-        console.print(f"[yellow]Warning: Custom CSS file not found: {custom_css}[/yellow]")
-
-    # Add theme-based styling
-    style_tag = merged_soup.new_tag("style")
+            log(f"\n[blue]Output would be saved to: {output_file}[/blue]")
+        return
     
-    # Get theme styles
-    base_styles = get_theme_styles(theme, tab_position)
-    style_tag.string = base_styles
-    merged_soup.head.append(style_tag)
-
-    # Add iframe-specific styling to ensure full height
-    if use_iframe:
-        iframe_style = merged_soup.new_tag("style")
-        iframe_style.string = """
-        #tab-contents { overflow: hidden; display: flex; flex-direction: column; }
-        .tab { flex: 1; display: none; flex-direction: column; padding: 0; }
-        .tab.active { display: flex; }
-        .tab-iframe { width: 100%; height: 100%; border: none; flex: 1; }
+    if not use_iframe and not no_cache:
+        options.cache = BuildCache(cache_dir, cache_size * 1024 * 1024, options={"mode": "inline", "parser": options.parser})
+        verbose_log(f"Using build cache: {cache_dir}")
+
+    result = MergeResult()
+    result.record("discovery", discovery_time, discovery_memory.get("discovery", 0.0))
+    if len(shards) == 1:
+        verbose_log(f"Writing merged HTML to: {output_file}")
+        merger = TabMerger(options, log, verbose_log)
+        result.add(merger.merge(file_tabs(files, directory_path, options), output_file))
+    else:
+        # Shards are written concurrently; they share one worker pool so the
+        # total number of extraction processes still honours --jobs.
+        writers = min(len(shards), options.jobs)
+        # Keep the pool off options, which is still used after the pool closes
+        shard_options = replace(options)
+        verbose_log(f"Writing {len(shards)} output files with {writers} concurrent writers")
+        worker_pool = create_worker_pool(options.jobs) if options.jobs > 1 else nullcontext()
+        with worker_pool as pool, ThreadPoolExecutor(max_workers=writers) as threads:
+            shard_options.pool = pool
+            merger = TabMerger(shard_options, log, verbose_log)
+            futures = [
+                threads.submit(merger.merge, file_tabs(shard, directory_path, options), shard_file)
+                for shard_file, shard in zip(shard_files, shards)
+            ]
+            results = [future.result() for future in futures]
+
+        for shard_result in results:
+            result.add(shard_result)
+
+        verbose_log(f"Writing index page to: {output_file}")
+        with result.phase("index page"):
+            write_index_page(output_file, shard_files, shards, directory_path, options)
+
+    if options.cache is not None:
+        verbose_log(f"Build cache: {result.cache_hits} hits, {len(files) - result.cache_hits} misses")
+        with result.phase("cache prune"):
+            evicted = options.cache.prune()
+        if evicted:
+            verbose_log(f"Evicted {evicted} least recently used cache entries")
+
+    if minify:
+        log(f"✂️  Minified the output, saving {result.minify_saved:,} bytes")
+    if compress:
+        log(f"🗜️  Compressed tab contents from {result.raw_bytes:,} to {result.packed_bytes:,} bytes")
+
+    if len(shards) == 1:
+        log(f"📄 Merged HTML saved as: [blue]{output_file}[/blue]")
+        log(f"   Combined {len(files)} files into a single tabbed interface")
+    else:
+        log(f"📄 Merged HTML saved as {len(shards)} files: [blue]{shard_files[0]}[/blue] ... [blue]{shard_files[-1]}[/blue]")
+        log(f"   Index page with all {len(files)} tabs saved as: [blue]{output_file}[/blue]")
+
+    wall_time = time.perf_counter() - started
+    if profile:
+        print_profile(result, wall_time)
+    if stats_json:
+        report = profile_report(result, wall_time)
+        report["meta"] = {"jobs": options.jobs, "mode": "iframe" if use_iframe else "inline", "files": len(files), "output_files": len(shards)}
+        with open(stats_json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        log(f"📊 Stats saved as: [blue]{stats_json}[/blue]")
+
+
+@app.command()
+def watch(
+    directory_path: str = DIRECTORY_ARGUMENT,
+    output_file: str = OUTPUT_FILE_ARGUMENT,
+
+    # File filtering options
+    pattern: List[str] = PATTERN_OPTION,
+    exclude: Optional[List[str]] = EXCLUDE_OPTION,
+    recursive: bool = RECURSIVE_OPTION,
+    prune_excluded: bool = PRUNE_EXCLUDED_OPTION,
+
+    # Sorting and organization
+    sort_by: str = SORT_BY_OPTION,
+    reverse_sort: bool = REVERSE_OPTION,
+
+    # Styling and customization
+    custom_css: Optional[str] = CUSTOM_CSS_OPTION,
+    theme: str = THEME_OPTION,
+    tab_position: str = TAB_POSITION_OPTION,
+
+    # Output control
+    verbose: bool = VERBOSE_OPTION,
+    quiet: bool = QUIET_OPTION,
+
+    # Tab naming
+    use_full_path: bool = FULL_PATH_OPTION,
+    strip_extensions: bool = STRIP_EXT_OPTION,
+
+    # Advanced options
+    use_iframe: bool = IFRAME_OPTION,
+    lazy: bool = LAZY_OPTION,
+    minify: bool = MINIFY_OPTION,
+    max_live_iframes: int = MAX_LIVE_IFRAMES_OPTION,
+    virtual_tabs: int = VIRTUAL_TABS_OPTION,
+    jobs: int = JOBS_OPTION,
+    parser: str = PARSER_OPTION,
+
+    # Watching
+    interval: float = typer.Option(1.0, "--interval", help="Seconds between directory scans"),
+    debounce: float = typer.Option(0.5, "--debounce", help="Seconds the directory must stay unchanged before rebuilding"),
+):
+    """
+    Watch a directory and rebuild the merged HTML file whenever reports change.
+
+    Only added or modified files are re-extracted; the output is replaced
+    atomically so a browser never sees a half-written file.
+    """
+
+    options, log, verbose_log = cli_options(
+        quiet,
+        verbose,
+        theme=theme,
+        tab_position=tab_position,
+        custom_css=custom_css,
+        use_full_path=use_full_path,
+        strip_extensions=strip_extensions,
+        use_iframe=use_iframe,
+        lazy=lazy,
+        minify=minify,
+        max_live_iframes=max_live_iframes,
+        virtual_tabs=virtual_tabs,
+        jobs=jobs,
+        parser=parser,
+        memo={},
+    )
+    if sort_by not in ("name", "size", "date", "none"):
+        console.print(f"[red]Invalid sort option: {sort_by}. Use: name, size, date, or none[/red]")
+        raise typer.Exit(1)
+
+    output_dir, output_name = os.path.split(os.path.abspath(output_file))
+    tmp_path = os.path.join(output_dir, f".{output_name}.tmp")
+
+    def scan() -> Tuple[List[Tuple[str, os.stat_result]], dict]:
+        try:
+            discovered, _ = discover_files(directory_path, pattern, exclude or [], recursive, prune_excluded)
+        except OSError:
+            discovered = []
+        # Never merge our own output back in, which would trigger endless rebuilds
+        discovered = skip_paths(discovered, [output_file, tmp_path])
+        return discovered, {path: (st.st_mtime_ns, st.st_size) for path, st in discovered}
+
+    log(f"👀 Watching [yellow]{directory_path}[/yellow] (Ctrl+C to stop)")
+    signatures: dict = {}
+    try:
+        while True:
+            discovered, current = scan()
+            if current == signatures:
+                time.sleep(interval)
+                continue
+
+            # Wait for writers to finish before rebuilding
+            while True:
+                time.sleep(debounce)
+                discovered, settled = scan()
+                if settled == current:
+                    break
+                current = settled
+
+            changed = [path for path, sig in current.items() if signatures.get(path) != sig]
+            removed = [path for path in signatures if path not in current]
+            for path in changed + removed:
+                options.memo.pop(Path(path), None)
+
+            if not discovered:
+                signatures = current
+                log(f"[yellow]No files matching pattern '{', '.join(pattern)}' in {directory_path}[/yellow]")
+                continue
+
+            sort_discovered(discovered, sort_by, reverse_sort)
+            files = [filepath for filepath, _ in discovered]
+
+            started = time.perf_counter()
+            try:
+                TabMerger(options, verbose_log, verbose_log).merge(file_tabs(files, directory_path, options), tmp_path)
+                os.replace(tmp_path, output_file)
+            except OSError as error:
+                # A report may vanish mid-rebuild; keep the old output and the
+                # old signatures so the next scan tries again
+                console.print(f"[red]Error: Rebuild failed, keeping the previous output: {error}[/red]")
+                continue
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            signatures = current
+
+            elapsed = time.perf_counter() - started
+            log(
+                f"🔄 Rebuilt [blue]{output_file}[/blue] with {len(files)} tabs "
+                f"({len(changed)} changed, {len(removed)} removed) in {elapsed:.2f}s"
+            )
+    except KeyboardInterrupt:
+        log("Stopped watching")
+
+
+@dataclass
+class MergeOptions:
+    """Settings that control how a list of files is rendered into one page."""
+    theme: str = "default"
+    tab_position: str = "top"
+    custom_css: Optional[str] = None
+    use_full_path: bool = False
+    strip_extensions: bool = True
+    use_iframe: bool = False
+    share_assets: bool = False
+    lazy: bool = False
+    compress: bool = False
+    # Collapse insignificant whitespace and strip comments from the output
+    minify: bool = False
+    max_live_iframes: int = 0
+    # Show a virtual, filterable tab list instead of buttons above this many tabs (0 = never)
+    virtual_tabs: int = 200
+    jobs: int = 1
+    # HTML parser for inline tabs, one of PARSERS
+    parser: str = "html.parser"
+    cache: Optional[BuildCache] = None
+    pool: Optional[Executor] = None
+    # Extraction results kept in memory between rebuilds, keyed by tab source
+    memo: Optional[dict] = None
+    # Measure the peak memory of each phase with tracemalloc, in workers too
+    trace_memory: bool = False
+
+    @property
+    def lazy_tabs(self) -> bool:
+        """Whether tab content is attached when first shown; compressed tabs are decompressed then."""
+        return self.lazy or self.compress
+
+
+@dataclass
+class FileStats:
+    """Measurements for a single merged document."""
+    name: str = ""
+    bytes_in: int = 0
+    bytes_out: int = 0
+    # Size of the tab content before compression
+    raw_bytes: int = 0
+    # Bytes removed from the tab content by --minify
+    minify_saved: int = 0
+    assets_deduplicated: int = 0
+    cache_hit: bool = False
+    # Seconds spent on this file in each phase (read, parse, escape, ...)
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Peak memory allocated in each phase, when tracing memory
+    peak_memory_mb: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class PhaseStats:
+    """Total time of one phase of a merge and the most memory it allocated at once.
+
+    The peak is measured with tracemalloc around each run of the phase, in
+    whichever process ran it, and is the largest over all runs (e.g. files).
+    """
+    time_s: float = 0.0
+    peak_memory_mb: float = 0.0
+
+
+@dataclass
+class MergeResult:
+    """Counters collected while writing a merged page."""
+    cache_hits: int = 0
+    raw_bytes: int = 0
+    packed_bytes: int = 0
+    minify_saved: int = 0
+    phases: Dict[str, PhaseStats] = field(default_factory=dict)
+    files: List[FileStats] = field(default_factory=list)
+
+    def add(self, other: "MergeResult"):
+        self.cache_hits += other.cache_hits
+        self.raw_bytes += other.raw_bytes
+        self.packed_bytes += other.packed_bytes
+        self.minify_saved += other.minify_saved
+        for name, stats in other.phases.items():
+            self.record(name, stats.time_s, stats.peak_memory_mb)
+        self.files.extend(other.files)
+
+    def record(self, name: str, seconds: float, peak_memory: float = 0.0):
+        """Add time to a phase and raise its peak memory to peak_memory (MB)."""
+        stats = self.phases.setdefault(name, PhaseStats())
+        stats.time_s += seconds
+        stats.peak_memory_mb = max(stats.peak_memory_mb, peak_memory)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Record the wall time and peak memory of the with-block under a phase."""
+        peaks = {}
+        started = time.perf_counter()
+        try:
+            with traced_phase(name, peaks):
+                yield
+        finally:
+            self.record(name, time.perf_counter() - started, peaks.get(name, 0.0))
+
+    def add_file(self, stats: FileStats):
+        """Keep a file's stats and fold its timings and savings into the totals."""
+        self.files.append(stats)
+        self.minify_saved += stats.minify_saved
+        for name, seconds in stats.timings.items():
+            self.record(name, seconds, stats.peak_memory_mb.get(name, 0.0))
+
+
+# Tab content: HTML text or bytes, an open text/binary file, or a path to a file.
+Source = Union[str, bytes, os.PathLike, IO]
+
+
+class Tab(NamedTuple):
+    """A document to merge: its tab label, its HTML source and an optional tooltip.
+
+    The source is HTML as ``str`` or ``bytes``, a text or binary file-like
+    object, or an ``os.PathLike`` naming a file. The tooltip defaults to the
+    label.
+    """
+    name: str
+    source: Source
+    title: Optional[str] = None
+
+
+class TabMerger:
+    """Merge HTML documents into a single page with one tab per document.
+
+    ``merge`` takes ``(name, source)`` or ``(name, source, title)`` items (see
+    ``Tab``) from any iterable, including generators, and streams the page to
+    a text file-like object or a path, so reports rendered in memory never
+    need to be written to disk first::
+
+        merger = TabMerger(use_iframe=True)
+        merger.merge([("Summary", summary_html), ("Plots", fig.to_html())], "report.html")
+
+    Keyword arguments override fields of ``options``.
+    """
+
+    def __init__(
+        self,
+        options: Optional[MergeOptions] = None,
+        log: Optional[Callable[[str], None]] = None,
+        verbose_log: Optional[Callable[[str], None]] = None,
+        **overrides,
+    ):
+        self.options = replace(options or MergeOptions(), **overrides)
+        self.log = log or (lambda message: None)
+        self.verbose_log = verbose_log or (lambda message: None)
+
+    def render(self, items: Iterable[tuple]) -> str:
+        """Merge items and return the page as a string."""
+        out = io.StringIO()
+        self.merge(items, out)
+        return out.getvalue()
+
+    def merge(self, items: Iterable[tuple], sink: Union[str, os.PathLike, IO[str]]) -> MergeResult:
+        """Write items as the tabs of a single page to sink, a text file-like object or a path.
+
+        Everything is streamed as it is produced, so memory stays flat no
+        matter how many (or how large) the documents are. Tab buttons precede
+        the tab contents, so contents are spooled until every name is known,
+        unless items is a sequence and the page has no head assets to collect.
         """
-        merged_soup.head.append(iframe_style)
+        if isinstance(sink, (str, os.PathLike)):
+            with open(sink, "w", encoding='utf-8') as out:
+                return self.merge(items, out)
 
-    # Tab switching script
-    script_tag = merged_soup.new_tag("script")
-    script_tag.string = """
-    function showTab(tabId, button) {
-        document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
-        document.querySelectorAll('.tab-button').forEach(btn => btn.classList.remove('active'));
-        document.getElementById(tabId).classList.add('active');
-        button.classList.add('active');
+        out = sink
+        options = self.options
+        log, verbose_log = self.log, self.verbose_log
+        jobs = options.jobs
+        result = MergeResult()
+
+        tabs: Iterable[Tab] = (Tab(*item) for item in items)
+        if options.use_iframe and options.share_assets:
+            # Shared blocks are found in a first pass over every document
+            tabs = [load_tab(tab) for tab in tabs]
+        elif isinstance(items, Sequence) or options.memo is not None:
+            tabs = list(tabs)
+
+        def use_virtual_tabs(tab_count: int) -> bool:
+            """Whether the tab list is too long to render every button."""
+            return 0 < options.virtual_tabs < tab_count
+
+        @contextmanager
+        def page_markup():
+            """Yield the sink for the page's own markup, which --minify minifies as it streams."""
+            if not options.minify:
+                yield out
+                return
+            page = MinifyingWriter(out)
+            yield page
+            page.close()
+            result.minify_saved += page.minifier.bytes_in - page.minifier.bytes_out
+
+        def page_code(code: str, minify: Callable[[str], str]) -> str:
+            """Return the page's own CSS or JS, minified under --minify."""
+            if not options.minify:
+                return code
+            minified = minify(code)
+            result.minify_saved += len(code.encode('utf-8')) - len(minified.encode('utf-8'))
+            return minified
+
+        def write_header(head_assets: IO[str], labels: List[Tuple[str, str]]):
+            """Write everything up to and including the opening of #tab-contents."""
+            virtual_tabs = use_virtual_tabs(len(labels))
+            with page_markup() as page:
+                page.write(HTML_SHELL_START)
+                head_assets.seek(0)
+                shutil.copyfileobj(head_assets, page)
+
+                # Add custom CSS if provided
+                if options.custom_css and os.path.exists(options.custom_css):
+                    verbose_log(f"Including custom CSS from: {options.custom_css}")
+                    with open(options.custom_css, "r", encoding='utf-8') as f:
+                        page.write(f"<style>{f.read()}</style>")
+                elif options.custom_css:
+                    console.print(f"[yellow]Warning: Custom CSS file not found: {options.custom_css}[/yellow]")
+
+                # Add theme-based styling
+                page.write(f"<style>{page_code(get_theme_styles(options.theme, options.tab_position), minify_css)}</style>")
+
+                # Add iframe-specific styling to ensure full height
+                if options.use_iframe:
+                    page.write(f"<style>{page_code(IFRAME_STYLES, minify_css)}</style>")
+
+                if virtual_tabs:
+                    page.write(f"<style>{page_code(get_virtual_tab_styles(options.tab_position), minify_css)}</style>")
+
+                page.write(HTML_SHELL_BODY)
+
+                if virtual_tabs:
+                    page.write(render_virtual_tab_list(labels))
+                else:
+                    for i, (tab_name, title) in enumerate(labels):
+                        page.write(render_tab_button(f"tab{i+1}", tab_name, title))
+
+                page.write(HTML_SHELL_CONTENTS)
+
+        if jobs > 1:
+            verbose_log(f"Extracting with {jobs} worker processes")
+
+        # Iframe tabs of a known list go straight into the output; anything
+        # else is spooled while the tab names and head assets are collected.
+        # Head assets get a spool of their own, as they precede the bodies.
+        direct = options.use_iframe and isinstance(tabs, list)
+        labels = [(tab.name, tab.title or tab.name) for tab in tabs] if direct else []
+        shared_blocks = set()
+
+        with nullcontext(out) if direct else create_spool() as body, create_spool() as head_assets:
+            if direct:
+                with result.phase("write"):
+                    write_header(head_assets, labels)
+            measure_out = body.seekable()
+
+            if options.use_iframe:
+                # Find inline <script>/<style> blocks that appear in more than one
+                # document; those are stored once and spliced back in by a small loader.
+                if options.share_assets:
+                    with result.phase("dedup"):
+                        block_counts = Counter()
+                        for digests in ordered_map(scan_asset_blocks, [tab.source for tab in tabs], jobs, options.pool):
+                            block_counts.update(digests)
+                        shared_blocks = {digest for digest, count in block_counts.items() if count > 1}
+                    verbose_log(f"Found {len(shared_blocks)} inline script/style blocks shared between files")
+
+                # Iframe mode never parses its inputs and has no head assets to
+                # collect, so each document is escaped chunk by chunk straight
+                # into the output and peak memory stays around one chunk.
+                stored_blocks = set()
+                bytes_saved = 0
+
+                def write_tab_stats(stats: FileStats, tab_start: int, tab_started: float, nested: Tuple[str, ...] = ("escape",)):
+                    """Record a tab's output size and the time spent writing it, excluding the nested phases."""
+                    if measure_out:
+                        stats.bytes_out = body.tell() - tab_start
+                    for name, peak in take_phase_memory().items():
+                        stats.peak_memory_mb[name] = max(stats.peak_memory_mb.get(name, 0.0), peak)
+                    nested_time = sum(stats.timings.get(name, 0.0) for name in nested)
+                    result.record("write", time.perf_counter() - tab_started - nested_time)
+                    result.add_file(stats)
+
+                # Sharing and compression need whole documents, which workers
+                # prepare in parallel; otherwise documents are streamed in chunks.
+                if shared_blocks or options.compress:
+                    tabs, pending = itertools.tee(map(load_tab, tabs))
+                    prepared = ordered_map(
+                        partial(
+                            prepare_iframe_document,
+                            shared_blocks=frozenset(shared_blocks), compress=options.compress, minify=options.minify,
+                            trace_memory=options.trace_memory,
+                        ),
+                        (tab.source for tab in pending), jobs, options.pool,
+                    )
+                else:
+                    prepared = itertools.repeat(None)
+
+                # Lazy tabs keep their document in data-srcdoc until first shown
+                srcdoc_attr = "data-srcdoc" if options.lazy_tabs else "srcdoc"
+                # Writing is timed per tab, without the nested phases; its
+                # memory is traced over the whole loop
+                write_memory = {}
+                with traced_phase("write", write_memory):
+                    for i, (tab, prepared_document) in enumerate(zip(tabs, prepared)):
+                        label = tab.title or tab.name
+                        if not direct:
+                            labels.append((tab.name, label))
+                        log(f"✅ Processing: [green]{label}[/green]")
+                        tab_id = f"tab{i+1}"
+                        tab_started = time.perf_counter()
+                        tab_start = body.tell() if measure_out else 0
+
+                        if prepared_document is None:
+                            stats = FileStats(label, bytes_in=source_size(tab.source))
+                            chunks = source_chunks(tab.source)
+                            if options.minify:
+                                minifier = HTMLMinifier()
+                                chunks = minifier.minify_chunks(chunks, stats.timings)
+                            body.write(tab_open_tag(tab_id, i == 0))
+                            write_srcdoc_iframe(body, chunks, attr=srcdoc_attr, timings=stats.timings)
+                            body.write("</div>")
+                            if options.minify:
+                                stats.minify_saved = minifier.bytes_in - minifier.bytes_out
+                            write_tab_stats(stats, tab_start, tab_started, nested=("escape", "minify"))
+                            continue
+
+                        document, blocks, saved, stats = prepared_document
+                        stats.name = label
+                        bytes_saved += saved
+
+                        # The first tab that uses a shared block carries its only copy
+                        for digest, block in blocks.items():
+                            if digest not in stored_blocks:
+                                if options.compress:
+                                    payload = compress_payload(block)
+                                    result.raw_bytes += len(block.encode('utf-8'))
+                                    result.packed_bytes += len(payload)
+                                    asset_html = render_payload(payload, f'class="htmltabs-asset" data-digest="{digest}"')
+                                else:
+                                    asset_html = render_shared_asset(digest, block)
+                                bytes_saved -= len(asset_html.encode('utf-8'))
+                                body.write(asset_html)
+                                stored_blocks.add(digest)
+
+                        body.write(tab_open_tag(tab_id, i == 0))
+                        if options.compress:
+                            result.raw_bytes += stats.raw_bytes
+                            result.packed_bytes += len(document)
+                            body.write(f'<iframe {IFRAME_ATTRS}></iframe>{render_payload(document)}')
+                        else:
+                            write_srcdoc_iframe(
+                                body, [document], attr="data-srcdoc" if blocks else srcdoc_attr, timings=stats.timings
+                            )
+                        body.write("</div>")
+                        write_tab_stats(stats, tab_start, tab_started)
+                result.record("write", 0.0, write_memory.get("write", 0.0))
+
+                if shared_blocks:
+                    bytes_saved -= len(SHARED_ASSET_SCRIPT.encode('utf-8'))
+                    log(f"♻️  Shared {len(stored_blocks)} inline script/style blocks, saving {max(bytes_saved, 0):,} bytes")
+            else:
+                # Each document is parsed exactly once; results arrive in order so
+                # the first-seen order of the deduplicated head assets is stable.
+                parser = available_parser(options.parser)
+                seen_blocks = set()
+                tabs, pending = itertools.tee(map(load_tab, tabs))
+                extracted = memoized_map(
+                    partial(
+                        extract_tab_content,
+                        cache=options.cache, compress=options.compress, minify=options.minify, parser=parser,
+                        trace_memory=options.trace_memory,
+                    ),
+                    (tab.source for tab in pending), jobs, options.pool, options.memo,
+                )
+                for i, (tab, ((assets, body_html), stats)) in enumerate(zip(tabs, extracted)):
+                    label = tab.title or tab.name
+                    labels.append((tab.name, label))
+                    stats.name = label
+                    if stats.cache_hit:
+                        result.cache_hits += 1
+                        log(f"✅ Processing: [green]{label}[/green] [dim](cached)[/dim]")
+                    else:
+                        log(f"✅ Processing: [green]{label}[/green]")
+
+                    # Deduplicate styles/scripts
+                    with result.phase("dedup"):
+                        duplicates = 0
+                        for tag_str in assets:
+                            block_key = hashlib.sha1(tag_str.encode('utf-8')).digest()
+                            if block_key not in seen_blocks:
+                                head_assets.write(tag_str)
+                                seen_blocks.add(block_key)
+                            else:
+                                duplicates += 1
+                        stats.assets_deduplicated = duplicates
+
+                    with result.phase("write"):
+                        tab_start = body.tell()
+                        if options.compress:
+                            result.raw_bytes += stats.raw_bytes
+                            result.packed_bytes += len(body_html)
+                            body.write(render_tab(f"tab{i+1}", i == 0, render_payload(body_html)))
+                        else:
+                            body.write(render_tab(f"tab{i+1}", i == 0, body_html, lazy=options.lazy_tabs))
+                        stats.bytes_out = body.tell() - tab_start
+                    result.add_file(stats)
+
+            with result.phase("write"):
+                if not direct:
+                    write_header(head_assets, labels)
+                    body.seek(0)
+                    shutil.copyfileobj(body, out)
+                scripts = TAB_SCRIPT + get_tab_scripts(options, bool(shared_blocks), use_virtual_tabs(len(labels)))
+                with page_markup() as page:
+                    page.write(render_footer(page_code(scripts, minify_js)))
+
+        return result
+
+
+def profile_report(result: MergeResult, wall_time: float) -> dict:
+    """Return a merge's phase and per-file stats as JSON-serializable data."""
+    files = []
+    for stats in result.files:
+        entry = asdict(stats)
+        entry["parse_time_s"] = stats.timings.get("parse", 0.0)
+        files.append(entry)
+
+    return {
+        "wall_time_s": wall_time,
+        "peak_rss_mb": peak_rss_mb(),
+        "bytes_in": sum(stats.bytes_in for stats in result.files),
+        "bytes_out": sum(stats.bytes_out for stats in result.files),
+        "minify_saved": result.minify_saved,
+        "phases": {name: asdict(stats) for name, stats in result.phases.items()},
+        "files": files,
     }
-    document.addEventListener("DOMContentLoaded", () => {
-        const firstButton = document.querySelector('.tab-button');
-        if (firstButton) firstButton.classList.add('active');
-    });
-    """
-    merged_soup.body.append(script_tag)
 
-    # Write to file
-    verbose_log(f"Writing merged HTML to: {output_file}")
+
+def print_profile(result: MergeResult, wall_time: float, slowest: int = 10):
+    """Print the phase breakdown of a merge and its slowest files."""
+    table = Table(title=f"Merge profile ({wall_time:.2f}s, main process peak RSS {peak_rss_mb():.1f} MB)")
+    table.add_column("Phase")
+    table.add_column("Time", justify="right")
+    table.add_column("Share", justify="right")
+    table.add_column("Peak memory", justify="right")
+    for name, stats in result.phases.items():
+        share = stats.time_s / wall_time if wall_time else 0.0
+        table.add_row(name, f"{stats.time_s:.3f}s", f"{share:.1%}", f"{stats.peak_memory_mb:.1f} MB")
+    console.print(table)
+    if result.phases.keys() & {"read", "cache", "parse", "serialize", "compress", "minify"} and len(result.files) > 1:
+        console.print("[dim]Per-file phases are summed over all files and worker processes; their peak memory is that of the largest file.[/dim]")
+
+    files = sorted(result.files, key=lambda stats: sum(stats.timings.values()), reverse=True)[:slowest]
+    table = Table(title=f"Slowest {len(files)} of {len(result.files)} files")
+    table.add_column("File", overflow="fold")
+    for column in ("Bytes in", "Bytes out", "Parse", "Total", "Deduped assets"):
+        table.add_column(column, justify="right")
+    for stats in files:
+        table.add_row(
+            stats.name,
+            f"{stats.bytes_in:,}",
+            f"{stats.bytes_out:,}",
+            f"{stats.timings.get('parse', 0.0):.3f}s",
+            f"{sum(stats.timings.values()):.3f}s",
+            str(stats.assets_deduplicated),
+        )
+    console.print(table)
+
+
+def write_index_page(
+    output_file: str,
+    shard_files: List[str],
+    shards: List[List[str]],
+    directory_path: str,
+    options: MergeOptions,
+):
+    """Write a landing page that links every tab to its shard and anchor."""
     with open(output_file, "w", encoding='utf-8') as f:
-        f.write(str(merged_soup))
+        out = MinifyingWriter(f) if options.minify else f
+        out.write(HTML_SHELL_START)
+        if options.custom_css and os.path.exists(options.custom_css):
+            with open(options.custom_css, "r", encoding='utf-8') as css:
+                out.write(f"<style>{css.read()}</style>")
+        for styles in (get_theme_styles(options.theme, options.tab_position), INDEX_STYLES):
+            out.write(f"<style>{minify_css(styles) if options.minify else styles}</style>")
+        out.write(HTML_SHELL_BODY)
+
+        shard_links = [quote(os.path.basename(shard_file)) for shard_file in shard_files]
+        for shard_link, shard in zip(shard_links, shards):
+            out.write(
+                f'<a class="tab-button" href={quote_attr(shard_link)} title="{len(shard)} tabs">'
+                f'{html.escape(os.path.splitext(unquote(shard_link))[0], quote=False)}</a>'
+            )
+
+        out.write(HTML_SHELL_CONTENTS)
+        out.write('<div class="tab active">')
+        for shard_link, shard in zip(shard_links, shards):
+            out.write(f'<div class="index-shard"><h2>{html.escape(unquote(shard_link), quote=False)}</h2><div class="index-links">')
+            for i, filepath in enumerate(shard):
+                rel_path = os.path.relpath(filepath, directory_path)
+                tab_name = get_tab_name(filepath, directory_path, options.use_full_path, options.strip_extensions)
+                out.write(
+                    f'<a class="tab-button" href={quote_attr(f"{shard_link}#tab{i+1}")} '
+                    f'title={quote_attr(rel_path)}>{html.escape(tab_name, quote=False)}</a>'
+                )
+            out.write('</div></div>')
+        out.write('</div>')
+        out.write(INDEX_SHELL_END)
+        if options.minify:
+            out.close()
+
+
+def compile_matcher(patterns: List[str], recursive: bool) -> Callable[[str, str], bool]:
+    """Compile glob-style patterns into a single matcher for (name, relative path).
+
+    Patterns without a slash match file names. Patterns with a slash match
+    the relative path or, when recursive, any trailing part of it.
+    """
+    patterns = [p.replace(os.sep, "/") for p in patterns]
+    name_patterns = [p for p in patterns if "/" not in p]
+    path_patterns = [p for p in patterns if "/" in p]
+
+    prefix = "(?:.*/)?" if recursive else ""
+    name_re = re.compile("|".join(glob_to_regex(p, recursive) for p in name_patterns)) if name_patterns else None
+    path_re = re.compile("|".join(prefix + glob_to_regex(p, recursive) for p in path_patterns)) if path_patterns else None
+
+    def matches(name: str, rel_path: str) -> bool:
+        return bool((name_re and name_re.fullmatch(name)) or (path_re and path_re.fullmatch(rel_path)))
+
+    return matches
+
+
+def glob_to_regex(pattern: str, recursive: bool = False) -> str:
+    """Translate a glob pattern into a regex whose wildcards never cross a '/'.
+
+    When recursive, a "**" path component matches any number of directories,
+    as with glob's recursive=True.
+    """
+    parts = []
+    for token in re.split(r"((?<![^/])\*\*(?:/|\Z)|\*|\?|\[[^\]]+\])", pattern):
+        if token == "**/" and recursive:
+            parts.append("(?:.*/)?")
+        elif token == "**" and recursive:
+            parts.append(".*")
+        elif token.startswith("**"):
+            parts.append("[^/]*" + token[2:])
+        elif token == "*":
+            parts.append("[^/]*")
+        elif token == "?":
+            parts.append("[^/]")
+        elif token.startswith("[") and token.endswith("]") and len(token) > 2:
+            body = token[1:-1]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+        else:
+            parts.append(re.escape(token))
+    return f"(?:{''.join(parts)})"
+
+
+def discover_files(
+    directory_path: str,
+    patterns: List[str],
+    excludes: List[str],
+    recursive: bool = False,
+    prune_excluded: bool = False,
+) -> Tuple[List[Tuple[str, os.stat_result]], int]:
+    """Find files matching any include pattern and no exclude pattern.
+
+    Walks the tree once with os.scandir and returns each matched path with
+    its stat result, plus the number of files dropped by exclusions. Like
+    glob, hidden files and directories are skipped unless a pattern starts
+    with a dot.
+    """
+    is_included = compile_matcher(patterns, recursive)
+    is_excluded = compile_matcher(excludes, recursive)
+    show_hidden = any(os.path.basename(p).startswith(".") for p in patterns)
+
+    # Without --recursive, only descend as deep as patterns like "sub/*.html" need
+    max_depth = None if recursive else max(p.replace(os.sep, "/").count("/") for p in patterns)
+
+    found: List[Tuple[str, os.stat_result]] = []
+    excluded_count = 0
+    root_stat = os.stat(directory_path)
+    visited = {(root_stat.st_dev, root_stat.st_ino)}
+    pending = deque([("", directory_path, 0)])
+    while pending:
+        rel_dir, dir_path, depth = pending.popleft()
+        subdirs = []
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError:
+            # Like glob, silently skip directories that cannot be read
+            continue
+
+        for entry in entries:
+            if entry.name.startswith(".") and not show_hidden:
+                continue
+            rel_path = f"{rel_dir}{entry.name}"
+
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if max_depth is None or depth < max_depth:
+                    if prune_excluded and is_excluded(entry.name, rel_path):
+                        continue
+                    subdirs.append((f"{rel_path}/", entry.path))
+                continue
+
+            if not is_included(entry.name, rel_path):
+                continue
+            if is_excluded(entry.name, rel_path):
+                excluded_count += 1
+                continue
+            try:
+                found.append((entry.path, entry.stat()))
+            except OSError:
+                continue
+
+        # Guard against symlink loops while still following linked directories
+        for rel_path, path in subdirs:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) not in visited:
+                visited.add((st.st_dev, st.st_ino))
+                pending.append((rel_path, path, depth + 1))
+
+    return found, excluded_count
+
+
+def skip_paths(discovered: List[Tuple[str, os.stat_result]], paths: List[str]) -> List[Tuple[str, os.stat_result]]:
+    """Drop discovered files that are one of paths, such as the output file, or one of its shards."""
+    skipped = {os.path.abspath(path) for path in paths}
+    shards = []
+    for path in skipped:
+        stem, ext = os.path.splitext(path)
+        shards.append(re.escape(stem) + r"-\d{3}" + re.escape(ext or ".html"))
+    shard_re = re.compile("|".join(shards))
+    return [(path, st) for path, st in discovered
+            if os.path.abspath(path) not in skipped and not shard_re.fullmatch(os.path.abspath(path))]
+
+
+def sort_discovered(discovered: List[Tuple[str, os.stat_result]], sort_by: str, reverse: bool = False):
+    """Sort discovered (path, stat) pairs in place by name, size, date or not at all."""
+    if sort_by == "name":
+        discovered.sort(key=lambda item: os.path.basename(item[0]), reverse=reverse)
+    elif sort_by == "size":
+        discovered.sort(key=lambda item: item[1].st_size, reverse=reverse)
+    elif sort_by == "date":
+        discovered.sort(key=lambda item: item[1].st_mtime, reverse=reverse)
+    elif sort_by != "none":
+        raise ValueError(f"Invalid sort option: {sort_by}")
+
+
+def get_tab_name(filepath: str, directory_path: str, use_full_path: bool, strip_extensions: bool) -> str:
+    """Generate the display name of a file's tab."""
+    if use_full_path:
+        tab_name = os.path.relpath(filepath, directory_path)
+    else:
+        tab_name = os.path.basename(filepath)
+
+    if strip_extensions:
+        tab_name = os.path.splitext(tab_name)[0]
+    return tab_name
+
+
+def file_tabs(files: List[str], directory_path: str, options: MergeOptions) -> List[Tab]:
+    """Return the tabs for files found under directory_path, titled with their relative paths."""
+    return [
+        Tab(
+            get_tab_name(filepath, directory_path, options.use_full_path, options.strip_extensions),
+            Path(filepath),
+            os.path.relpath(filepath, directory_path),
+        )
+        for filepath in files
+    ]
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte size such as '500000', '200K', '200M' or '1.5G'."""
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(float(match.group(1)) * units[match.group(2).upper()])
+
+
+def plan_shards(files: List[str], sizes: List[int], max_tabs: int, max_bytes: int) -> List[List[str]]:
+    """Split files, in order, into shards that respect the tab and size budgets.
+
+    Sizes are estimated from the input files; a single file larger than the
+    size budget gets a shard of its own. A budget of 0 means unlimited.
+    """
+    shards: List[List[str]] = [[]]
+    shard_bytes = 0
+    for filepath, size in zip(files, sizes):
+        current = shards[-1]
+        if current and (
+            (max_tabs and len(current) >= max_tabs)
+            or (max_bytes and shard_bytes + size > max_bytes)
+        ):
+            shards.append([])
+            shard_bytes = 0
+        shards[-1].append(filepath)
+        shard_bytes += size
+    return shards
+
+
+def shard_file_names(output_file: str, count: int) -> List[str]:
+    """Return merged-001.html, merged-002.html, ... next to output_file."""
+    stem, ext = os.path.splitext(output_file)
+    return [f"{stem}-{i:03d}{ext or '.html'}" for i in range(1, count + 1)]
+
+
+def decode_html(data: bytes) -> str:
+    """Decode raw file bytes exactly as reading the file in text mode would."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore').read()
+
+
+def parse_html(
+    content: str, timings: Optional[Dict[str, float]] = None, parser: str = "html.parser"
+) -> Tuple[List[str], str]:
+    """Parse an HTML document once and return its head assets and body fragment."""
+    if parser == "fast":
+        with timed(timings, "parse"):
+            extracted = scan_html(content)
+        if extracted is not None:
+            return extracted
+        # Documents without a <body> tag get the regular treatment
+        parser = "html.parser"
+
+    with timed(timings, "parse"):
+        soup = BeautifulSoup(content, parser)
+
+    with timed(timings, "serialize"):
+        assets = []
+        if soup.head:
+            assets = [str(tag) for tag in soup.head.find_all(["style", "link", "script"])]
+
+        # Extract body content or entire content if no body tag
+        root = soup.body if soup.body else soup
+        body_html = "".join(
+            element_html for element_html in map(str, root.contents) if element_html.strip()
+        )
+    return assets, body_html
+
+
+class BodyFound(Exception):
+    """Raised by HeadScanner to stop tokenizing at the opening <body> tag."""
+
+
+class HeadScanner(HTMLParser):
+    """Tokenizer pass that records the <head> assets of a document and where its body starts.
+
+    Assets are kept exactly as written in the source. Tokenizing stops at the
+    opening <body> tag, so the cost does not grow with the size of the body.
+    """
+
+    def __init__(self, text: str):
+        super().__init__(convert_charrefs=False)
+        self.text = text
+        self.line_starts = [0]
+        self.in_head = False
+        self.asset_start: Optional[int] = None
+        self.assets: List[str] = []
+        self.body_start: Optional[int] = None
+
+    def position(self) -> int:
+        """Return the position in text of the tag being handled."""
+        line, column = self.getpos()
+        while len(self.line_starts) < line:
+            self.line_starts.append(self.text.index("\n", self.line_starts[-1]) + 1)
+        return self.line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.body_start = self.position() + len(self.get_starttag_text())
+            raise BodyFound
+        if tag == "head":
+            self.in_head = True
+        elif self.in_head and tag == "link":
+            self.assets.append(self.get_starttag_text())
+        elif self.in_head and tag in ("script", "style"):
+            self.asset_start = self.position()
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.in_head = False
+        elif tag in ("script", "style") and self.asset_start is not None:
+            end = self.text.index(">", self.position()) + 1
+            self.assets.append(self.text[self.asset_start:end])
+            self.asset_start = None
+
+
+def scan_html(content: str) -> Optional[Tuple[List[str], str]]:
+    """Find a document's head assets and body fragment without building a tree.
+
+    The body fragment is the source between the <body> tag and the last
+    </body> (or </html>) tag. Returns None when the document has no <body>.
+    """
+    scanner = HeadScanner(content)
+    try:
+        scanner.feed(content)
+    except BodyFound:
+        pass
+    if scanner.body_start is None:
+        return None
+
+    body_end = len(content)
+    for pattern in (BODY_END_RE, HTML_END_RE):
+        match = None
+        for match in pattern.finditer(content, scanner.body_start):
+            pass
+        if match:
+            body_end = match.start()
+            break
+    return scanner.assets, content[scanner.body_start:body_end].strip()
+
+
+def available_parser(parser: str) -> str:
+    """Return parser if it can be used here, otherwise the built-in html.parser.
+
+    Raises ValueError for unknown parser names.
+    """
+    if parser not in PARSERS:
+        raise ValueError(parser)
+    if parser == "lxml" and builder_registry.lookup("lxml") is None:
+        return "html.parser"
+    return parser
+
+
+def extract_html(
+    source: Source,
+    cache: Optional[BuildCache] = None,
+    stats: Optional[FileStats] = None,
+    parser: str = "html.parser",
+) -> Tuple[Tuple[List[str], str], bool]:
+    """Extract a document's head assets and body fragment, consulting the build cache first.
+
+    Returns the extraction result and whether it was served from the cache.
+    Time spent in each step is added to stats when it is given.
+    """
+    timings = stats.timings if stats is not None else None
+    with timed(timings, "read"):
+        data = source_bytes(source)
+    if stats is not None:
+        stats.bytes_in = len(data)
+
+    if cache is None:
+        return parse_html(decode_html(data), timings, parser), False
+
+    with timed(timings, "cache"):
+        key = cache.key(data)
+        cached = cache.get(key)
+    if cached is not None:
+        return (cached["assets"], cached["body"]), True
+
+    assets, body_html = parse_html(decode_html(data), timings, parser)
+    with timed(timings, "cache"):
+        cache.put(key, {"assets": assets, "body": body_html})
+    return (assets, body_html), False
+
+
+def extract_tab_content(
+    source: Source,
+    cache: Optional[BuildCache] = None,
+    compress: bool = False,
+    parser: str = "html.parser",
+    minify: bool = False,
+    trace_memory: bool = False,
+) -> Tuple[Tuple[List[str], str], FileStats]:
+    """Extract a document for an inline tab, optionally minifying and compressing its body.
+
+    Returns the head assets and body (or compressed payload) along with the
+    document's stats, which record whether the extraction was a cache hit and
+    the uncompressed body size.
+    """
+    start_tracing(trace_memory)
+    stats = FileStats()
+    (assets, body_html), stats.cache_hit = extract_html(source, cache, stats, parser)
+    # The cache keeps the extracted body as is, so it serves both settings
+    if minify:
+        with timed(stats.timings, "minify"):
+            body_html, stats.minify_saved = minify_html(body_html)
+    stats.raw_bytes = len(body_html.encode('utf-8'))
+    if compress:
+        with timed(stats.timings, "compress"):
+            body_html = compress_payload(body_html)
+    stats.peak_memory_mb = take_phase_memory()
+    return (assets, body_html), stats
+
+
+def source_bytes(source: Source) -> bytes:
+    """Return the raw bytes of a tab source."""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, str):
+        return source.encode('utf-8')
+    if isinstance(source, os.PathLike):
+        with open(source, "rb") as f:
+            return f.read()
+    data = source.read()
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+
+def source_text(source: Source) -> str:
+    """Return the decoded text of a tab source."""
+    if isinstance(source, str):
+        return source
+    if isinstance(source, os.PathLike):
+        with open(source, "r", encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    return decode_html(source_bytes(source))
+
+
+def source_size(source: Source) -> int:
+    """Return the size of a tab source in bytes, or 0 for a stream of unknown size."""
+    if isinstance(source, bytes):
+        return len(source)
+    if isinstance(source, str):
+        return len(source.encode('utf-8'))
+    if isinstance(source, os.PathLike):
+        return os.path.getsize(source)
+    return 0
+
+
+def source_chunks(source: Source, chunk_size: int = SRCDOC_CHUNK_SIZE) -> Iterator[str]:
+    """Yield the decoded text of a tab source in chunks of about chunk_size characters."""
+    if isinstance(source, os.PathLike):
+        yield from read_chunks(source, chunk_size)
+        return
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+
+    stream = io.BytesIO(source) if isinstance(source, bytes) else source
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    while chunk := stream.read(chunk_size):
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
+
+def load_tab(tab: Tab) -> Tab:
+    """Read a file-like source into memory so it can be sent to workers or read twice."""
+    if isinstance(tab.source, (str, bytes, os.PathLike)):
+        return tab
+    return tab._replace(source=source_bytes(tab.source))
+
+
+def create_spool() -> IO[str]:
+    """Return a text buffer that moves from memory to a temporary file as it grows."""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+", encoding='utf-8')
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def ordered_map(
+    func: Callable[[T], R], items: Iterable[T], jobs: int, pool: Optional[Executor] = None
+) -> Iterator[R]:
+    """Map func over items in a process pool, yielding results in input order.
+
+    At most ``2 * jobs`` items are in flight at once so that finished results
+    never pile up in memory faster than the caller consumes them. An existing
+    pool can be passed in to share workers between concurrent callers.
+    """
+    if pool is None and jobs <= 1:
+        yield from map(func, items)
+        return
+
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=jobs) as own_pool:
+            yield from ordered_map(func, items, jobs, own_pool)
+        return
+
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= 2 * jobs:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def memoized_map(
+    func: Callable[[T], R], items: Iterable[T], jobs: int, pool: Optional[Executor], memo: Optional[dict]
+) -> Iterator[R]:
+    """Like ordered_map, but reuse results already stored in memo.
+
+    Only items missing from memo are processed; new results are stored back.
+    """
+    if memo is None:
+        yield from ordered_map(func, items, jobs, pool)
+        return
+
+    items = list(items)
+    fresh = ordered_map(func, [item for item in items if item not in memo], jobs, pool)
+    for item in items:
+        if item not in memo:
+            memo[item] = next(fresh)
+        yield memo[item]
+
+
+def create_worker_pool(jobs: int) -> ProcessPoolExecutor:
+    """Create a process pool that is safe to use from several threads."""
+    # Forking a multi-threaded process is unsafe, so prefer a fork server
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=context)
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MB (0 where unsupported)."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == "darwin" else peak * 1024) / (1024 * 1024)
+
+
+class PhaseMemory(threading.local):
+    """Per-thread state of traced_phase."""
+
+    def __init__(self):
+        # [memory in use at the start, peak reached before a nested phase] of each open phase
+        self.open: List[List[int]] = []
+        # Peaks of the phases timed since the last take_phase_memory
+        self.peaks: Dict[str, float] = {}
+
+
+phase_memory = PhaseMemory()
+
+
+def start_tracing(enabled: bool):
+    """Start tracing memory allocations in this process, if enabled and not yet started."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+@contextmanager
+def traced_phase(name: str, peaks: Optional[Dict[str, float]] = None):
+    """Raise peaks[name] to the most memory (MB) the with-block allocated at once.
+
+    Does nothing unless tracemalloc is tracing. Phases may nest: tracemalloc
+    has a single peak, so the peak an enclosing phase had reached is kept
+    aside before a nested phase resets it. Threads share that peak, so shards
+    written concurrently count each other's allocations. Peaks go to this
+    thread's pending peaks, collected by take_phase_memory, when no dict is given.
+    """
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    if phase_memory.open:
+        phase_memory.open[-1][1] = max(phase_memory.open[-1][1], peak)
+    phase_memory.open.append([current, 0])
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        start, outer_peak = phase_memory.open.pop()
+        peak = max(outer_peak, tracemalloc.get_traced_memory()[1]) - start
+        if peaks is None:
+            peaks = phase_memory.peaks
+        peaks[name] = max(peaks.get(name, 0.0), peak / (1024 * 1024))
+
+
+def take_phase_memory() -> Dict[str, float]:
+    """Return and clear the peaks that timed recorded in this thread."""
+    peaks, phase_memory.peaks = phase_memory.peaks, {}
+    return peaks
+
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], name: str):
+    """Add the wall time of the with-block to timings[name], if timings is given.
+
+    Its peak memory is kept for take_phase_memory while tracing.
+    """
+    started = time.perf_counter()
+    try:
+        with traced_phase(name):
+            yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def tab_open_tag(tab_id: str, active: bool) -> str:
+    """Return the opening tag of a tab's container div."""
+    tab_class = "tab active" if active else "tab"
+    return f'<div class="{tab_class}" id="{tab_id}">'
+
+
+def render_tab(tab_id: str, active: bool, content_html: str, lazy: bool = False) -> str:
+    """Wrap rendered content in the tab's container div.
+
+    In lazy mode the content of inactive tabs is held inert in a <template>
+    until the tab is first shown.
+    """
+    if lazy and not active:
+        content_html = f"<template>{content_html}</template>"
+    return f'{tab_open_tag(tab_id, active)}{content_html}</div>'
+
+
+def escape_attr_text(text: str) -> str:
+    """Escape text for use inside a double-quoted HTML attribute.
+
+    Every replacement is a single character, so chunks of a larger document
+    can be escaped independently.
+    """
+    return text.replace("&", "&amp;").replace('"', "&quot;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def read_chunks(filepath: str, chunk_size: int = SRCDOC_CHUNK_SIZE) -> Iterator[str]:
+    """Yield the decoded text of a file in fixed-size chunks."""
+    with open(filepath, "r", encoding='utf-8', errors='ignore') as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def write_srcdoc_iframe(
+    out, chunks: Iterable[str], attr: str = "srcdoc", timings: Optional[Dict[str, float]] = None
+):
+    """Stream a document into an iframe attribute without parsing it."""
+    out.write(f'<iframe {IFRAME_ATTRS} {attr}="')
+    for chunk in chunks:
+        with timed(timings, "escape"):
+            escaped = escape_attr_text(chunk)
+        out.write(escaped)
+    out.write('"></iframe>')
+
+
+def asset_digest(block: str) -> str:
+    """Return the content hash used to identify a shared script/style block."""
+    return hashlib.sha256(block.encode('utf-8')).hexdigest()[:32]
+
+
+def scan_asset_blocks(source: Source) -> List[str]:
+    """Return the digests of the large inline script/style blocks in a document."""
+    content = source_text(source)
+    digests = (
+        asset_digest(match.group(0))
+        for match in ASSET_BLOCK_RE.finditer(content)
+        if len(match.group(0)) >= SHARED_ASSET_MIN_SIZE
+    )
+    return list(dict.fromkeys(digests))
+
+
+def replace_shared_blocks(document: str, shared: set) -> Tuple[str, dict, int]:
+    """Replace shared script/style blocks in a document with asset markers.
+
+    Returns the rewritten document, the replaced blocks by digest and the
+    number of output bytes saved by the replacements.
+    """
+    blocks = {}
+    saved = 0
+
+    def replace(match):
+        nonlocal saved
+        block = match.group(0)
+        if len(block) < SHARED_ASSET_MIN_SIZE:
+            return block
+        digest = asset_digest(block)
+        if digest not in shared:
+            return block
+        blocks[digest] = block
+        marker = f"<!--htmltabs-asset:{digest}-->"
+        saved += len(escape_attr_text(block).encode('utf-8')) - len(escape_attr_text(marker))
+        return marker
+
+    return ASSET_BLOCK_RE.sub(replace, document), blocks, saved
+
+
+def prepare_iframe_document(
+    source: Source,
+    shared_blocks: frozenset = frozenset(),
+    compress: bool = False,
+    minify: bool = False,
+    trace_memory: bool = False,
+) -> Tuple[str, dict, int, FileStats]:
+    """Read a document for an iframe tab, replacing shared blocks and optionally minifying and compressing it.
+
+    Returns the document (or compressed payload), the replaced shared blocks
+    by digest, the bytes saved by sharing and the document's stats.
+    """
+    start_tracing(trace_memory)
+    stats = FileStats(bytes_in=source_size(source))
+    with timed(stats.timings, "read"):
+        document = source_text(source)
+
+    # Minify first: the markers that replace shared blocks are comments
+    if minify:
+        with timed(stats.timings, "minify"):
+            document, stats.minify_saved = minify_html(document)
+
+    blocks, saved = {}, 0
+    if shared_blocks:
+        with timed(stats.timings, "dedup"):
+            document, blocks, saved = replace_shared_blocks(document, shared_blocks)
+        stats.assets_deduplicated = len(blocks)
+
+    stats.raw_bytes = len(document.encode('utf-8'))
+    if compress:
+        with timed(stats.timings, "compress"):
+            document = compress_payload(document)
+    stats.peak_memory_mb = take_phase_memory()
+    return document, blocks, saved, stats
+
+
+def compress_payload(text: str) -> str:
+    """Gzip-compress text and return it base64 encoded."""
+    return base64.b64encode(gzip.compress(text.encode('utf-8'), mtime=0)).decode('ascii')
+
+
+def render_payload(payload: str, attrs: str = 'class="htmltabs-payload"') -> str:
+    """Render a compressed payload as an inert script element."""
+    return f'<script type="application/x-gzip-base64" {attrs}>{payload}</script>'
+
+
+def render_shared_asset(digest: str, block: str) -> str:
+    """Render the single stored copy of a shared script/style block."""
+    # Escaping every "<" keeps the JSON inert inside the <script> element
+    payload = json.dumps(block, ensure_ascii=False).replace("<", "\\u003c")
+    return f'<script type="application/json" class="htmltabs-asset" data-digest="{digest}">{payload}</script>'
+
+
+class HTMLMinifier:
+    """Minifies HTML that arrives in arbitrary chunks.
+
+    Whitespace runs shrink to one character and disappear next to block-level
+    tags, and comments other than conditional comments are removed. Tags,
+    attribute values and the contents of <pre>, <textarea>, <script> and
+    <style> pass through unchanged. Only what could still change meaning with
+    the next chunk (a partial tag or comment, trailing whitespace, or a
+    possible closing tag) is held back.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        # Raw element whose closing tag is awaited, and the quote of an
+        # attribute value being copied from a tag that spans chunks
+        self.raw_tag = ""
+        self.in_tag = False
+        self.quote = ""
+        # Whether that tag is a block-level tag, and whether whitespace after
+        # the one just finished is still to be dropped
+        self.block_tag = False
+        self.drop_space = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def feed(self, text: str) -> str:
+        """Add text and return the minified output that is ready so far."""
+        self.bytes_in += len(text.encode('utf-8'))
+        self.buffer += text
+        return self._emit(self._process(final=False))
+
+    def close(self) -> str:
+        """Return whatever output is still held back."""
+        output = self._process(final=True)
+        self.raw_tag, self.in_tag, self.quote = "", False, ""
+        self.block_tag = self.drop_space = False
+        return self._emit(output)
+
+    def minify_chunks(self, chunks: Iterable[str], timings: Optional[Dict[str, float]] = None) -> Iterator[str]:
+        """Minify a stream of chunks, recording the time spent under "minify"."""
+        for chunk in chunks:
+            with timed(timings, "minify"):
+                output = self.feed(chunk)
+            yield output
+        with timed(timings, "minify"):
+            output = self.close()
+        yield output
+
+    def _emit(self, output: str) -> str:
+        self.bytes_out += len(output.encode('utf-8'))
+        return output
+
+    @staticmethod
+    def _ends_with_block_tag(buf: str, pos: int, end: int) -> bool:
+        """Whether buf[pos:end] ends with a block-level tag, so that the
+        whitespace after it is dropped as minify_markup would."""
+        if not buf.endswith(">", pos, end):
+            return False
+        tag = None
+        for tag in MINIFY_TAG_RE.finditer(buf, pos, end):
+            pass
+        return tag is not None and tag.end() == end and is_block_tag(buf, tag.start())
+
+    def _process(self, final: bool) -> str:
+        buf = self.buffer
+        pos = 0
+        parts = []
+        while pos < len(buf):
+            if self.raw_tag:
+                end = MINIFY_RAW_END_RE[self.raw_tag].search(buf, pos)
+                if end is None:
+                    # Keep back what may be the start of the closing tag
+                    stop = len(buf) if final else max(pos, len(buf) - len(self.raw_tag) - 2)
+                    parts.append(buf[pos:stop])
+                    pos = stop
+                    break
+                parts.append(buf[pos:end.start()])
+                pos = end.start()
+                self.raw_tag = ""
+            elif self.quote:
+                end = buf.find(self.quote, pos)
+                if end == -1:
+                    parts.append(buf[pos:])
+                    pos = len(buf)
+                    break
+                parts.append(buf[pos:end + 1])
+                pos = end + 1
+                self.quote = ""
+            elif self.in_tag:
+                stop = MINIFY_TAG_STOP_RE.search(buf, pos)
+                if stop is None:
+                    end = len(buf)
+                    if not final:
+                        # An "=" at the end may still be followed by a quoted value
+                        trimmed = len(buf.rstrip(" \t\n\r\f"))
+                        if trimmed > pos and buf[trimmed - 1] == "=":
+                            end = trimmed - 1
+                    parts.append(buf[pos:end])
+                    pos = end
+                    break
+                parts.append(buf[pos:stop.end()])
+                pos = stop.end()
+                if stop.group(1):
+                    self.quote = stop.group(1)
+                else:
+                    self.in_tag = False
+                    self.drop_space = self.block_tag
+            else:
+                if self.drop_space:
+                    while pos < len(buf) and buf[pos] in " \t\n\r\f":
+                        pos += 1
+                    if pos == len(buf):
+                        break
+                    self.drop_space = False
+                scan = MINIFY_TEXT_RE.match(buf, pos)
+                stop = scan.end()
+                if stop == len(buf):
+                    if final:
+                        parts.append(minify_markup(buf[pos:]))
+                        pos = len(buf)
+                        break
+                    # A "<" at the end may still become a tag or comment, and
+                    # trailing whitespace waits for what follows it
+                    start = buf.rfind("<", max(pos, len(buf) - 3))
+                    if start == -1 or not MINIFY_PARTIAL_TAG_RE.match(buf, start):
+                        start = len(buf)
+                    end = start
+                    while end > pos and buf[end - 1] in " \t\n\r\f":
+                        end -= 1
+                    parts.append(minify_markup(buf[pos:end]))
+                    self.drop_space = self._ends_with_block_tag(buf, pos, end)
+                    pos = end
+                    break
+
+                # A comment, a raw element opener or a tag that is not complete yet
+                special = MINIFY_SPECIAL_RE.match(buf, stop)
+                if special is not None and special.group(1) is None:
+                    parts.append(minify_markup(buf[pos:stop]))
+                    pos = stop
+                    end = buf.find("-->", stop + 4)
+                    if end == -1:
+                        break
+                    comment = buf[stop:end + 3]
+                    if comment.startswith("<!--["):
+                        # Conditional comments still mean something to old browsers
+                        parts.append(comment)
+                    pos = end + 3
+                    continue
+
+                # Whitespace before a block-level tag is dropped
+                end = stop
+                if is_block_tag(buf, stop):
+                    while end > pos and buf[end - 1] in " \t\n\r\f":
+                        end -= 1
+                tag = MINIFY_TAG_RE.match(buf, stop) if special is not None else None
+                name = MINIFY_TAG_START_RE.match(buf, stop)
+                if tag is not None:
+                    parts.append(minify_markup(buf[pos:end]))
+                    parts.append(tag.group())
+                    pos = tag.end()
+                    self.raw_tag = special.group(1).lower()
+                elif name is None or special is not None or final:
+                    # Wait for the tag name or the whole raw element opener,
+                    # holding back the whitespace before it
+                    if not final:
+                        while stop > pos and buf[stop - 1] in " \t\n\r\f":
+                            stop -= 1
+                        self.drop_space = self._ends_with_block_tag(buf, pos, stop)
+                    parts.append(minify_markup(buf[pos:stop]))
+                    pos = stop
+                    break
+                else:
+                    # A tag cut off at the end is copied as it streams in
+                    self.block_tag = is_block_tag(buf, stop)
+                    parts.append(minify_markup(buf[pos:end]))
+                    parts.append(name.group())
+                    pos = name.end()
+                    self.in_tag = True
+
+        if final and pos < len(buf):
+            # Unterminated comments and tags are left for the browser to deal with
+            parts.append(buf[pos:])
+            pos = len(buf)
+        self.buffer = buf[pos:]
+        return "".join(parts)
+
+
+class MinifyingWriter:
+    """A text sink that minifies the HTML written to it on its way to out."""
+
+    def __init__(self, out: IO[str]):
+        self.out = out
+        self.minifier = HTMLMinifier()
+
+    def write(self, text: str) -> int:
+        self.out.write(self.minifier.feed(text))
+        return len(text)
+
+    def writelines(self, lines: Iterable[str]):
+        for line in lines:
+            self.write(line)
+
+    def seekable(self) -> bool:
+        return self.out.seekable()
+
+    def tell(self) -> int:
+        return self.out.tell()
+
+    def close(self):
+        """Write out the held back tail; out itself stays open."""
+        self.out.write(self.minifier.close())
+
+
+def minify_markup(text: str) -> str:
+    """Minify markup that holds no comments, raw elements or partial tags."""
+    return MINIFY_MARKUP_RE.sub(minify_space, text)
+
+
+def minify_space(match: re.Match) -> str:
+    """Keep a tag; shrink a whitespace run to its first newline or character, or drop it next to a block-level tag."""
+    space = match.group()
+    tag = ""
+    if space[0] == "<":
+        tag = space.rstrip(" \t\n\r\f")
+        if len(tag) == len(space):
+            return space
+        if is_block_tag(tag, 0):
+            return tag
+        space = space[len(tag):]
+    if is_block_tag(match.string, match.end()):
+        return tag
+    return tag + ("\n" if "\n" in space else space[0])
+
+
+def is_block_tag(text: str, start: int) -> bool:
+    """Whether a block-level opening or closing tag starts at text[start]."""
+    name = MINIFY_TAG_NAME_RE.match(text, start) if start >= 0 else None
+    return name is not None and name.group(1).lower() in MINIFY_BLOCK_TAGS
+
+
+def minify_html(document: str) -> Tuple[str, int]:
+    """Minify a whole document, returning it and the number of bytes removed."""
+    minifier = HTMLMinifier()
+    document = minifier.feed(document) + minifier.close()
+    return document, minifier.bytes_in - minifier.bytes_out
+
+
+def minify_css(css: str) -> str:
+    """Minify the page's own stylesheets."""
+    css = CSS_COMMENT_RE.sub("", css)
+    css = CSS_PUNCTUATION_RE.sub(r"\1", " ".join(css.split()))
+    return css.replace(": ", ":").replace(";}", "}").strip()
+
+
+def minify_js(script: str) -> str:
+    """Minify the page's own scripts by dropping indentation, blank lines and comment lines.
+
+    Line breaks are kept, so automatic semicolon insertion is unaffected.
+    """
+    lines = (line.strip() for line in script.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def quote_attr(value: str) -> str:
+    """Escape and quote an HTML attribute value."""
+    return f'"{escape_attr_text(value)}"'
+
+
+def render_tab_button(tab_id: str, tab_name: str, rel_path: str) -> str:
+    """Render the button that switches to the given tab."""
+    return (
+        f'<button class="tab-button" data-tab="{tab_id}" '
+        f'title={quote_attr(rel_path)}>{html.escape(tab_name, quote=False)}</button>'
+    )
+
+
+def render_virtual_tab_list(labels: List[Tuple[str, str]]) -> str:
+    """Render the filter box, the empty virtual list and the JSON index it is drawn from."""
+    # Escaping every "<" keeps the JSON inert inside the <script> element
+    index = json.dumps(labels, ensure_ascii=False).replace("<", "\\u003c")
+    return (
+        '<input id="tab-filter" type="search" placeholder="Filter tabs" aria-label="Filter tabs">'
+        '<div id="tab-list"><div id="tab-list-spacer"><div id="tab-rows"></div></div></div>'
+        f'<script type="application/json" id="tab-index">{index}</script>'
+    )
+
+
+def get_tab_scripts(options: "MergeOptions", share_assets: bool, virtual_tabs: bool = False) -> str:
+    """Get the scripts needed on top of the tab switcher for the given options."""
+    scripts = ""
+    if share_assets or options.compress:
+        scripts += PAYLOAD_SCRIPT
+    if options.use_iframe and (share_assets or options.lazy_tabs):
+        scripts += SHARED_ASSET_SCRIPT if share_assets else SRCDOC_SCRIPT
+    if options.lazy_tabs:
+        scripts += f"\n    const maxLiveIframes = {options.max_live_iframes};" + LAZY_TAB_SCRIPT
+    elif options.use_iframe and share_assets:
+        scripts += EAGER_SRCDOC_SCRIPT
+    if virtual_tabs:
+        scripts += VIRTUAL_TAB_SCRIPT
+    return scripts
+
 
-    log(f"📄 Merged HTML saved as: [blue]{output_file}[/blue]")
-    log(f"   Combined {len(files)} files into a single tabbed interface")
+def get_virtual_tab_styles(tab_position: str) -> str:
+    """Get the styles of the virtual tab list for the given tab position."""
+    if tab_position in ("left", "right"):
+        return VIRTUAL_TAB_STYLES
+    # A horizontal bar has no height of its own, so give the list one
+    return VIRTUAL_TAB_STYLES + "#tab-list { flex: none; height: 30vh; }\n"
 
 
 def get_theme_styles(theme: str, tab_position: str) -> str:
@@ -0,0 +1,59 @@
+import os
+import pickle
+
+from htmltabs import TabMerger
+from htmltabs.cache import BuildCache
+
+REPORT = "<html><head><style>p { margin: 0; }</style></head><body><p>report</p></body></html>"
+
+
+def entry_size(cache: BuildCache, key: str) -> int:
+    return os.path.getsize(cache._path(key))
+
+
+def test_miss_then_hit(tmp_path):
+    cache = BuildCache(str(tmp_path), 1024 * 1024)
+    key = cache.key(b"<p>report</p>")
+    assert cache.get(key) is None
+    cache.put(key, {"assets": [], "body": "<p>report</p>"})
+    assert cache.get(key) == {"assets": [], "body": "<p>report</p>"}
+    # A fresh instance, e.g. in a worker process or the next run, sees the entry
+    assert pickle.loads(pickle.dumps(cache)).get(key) == {"assets": [], "body": "<p>report</p>"}
+
+
+def test_key_depends_on_content_and_options(tmp_path):
+    cache = BuildCache(str(tmp_path), 1024 * 1024, options={"parser": "html.parser"})
+    other = BuildCache(str(tmp_path), 1024 * 1024, options={"parser": "fast"})
+    assert cache.key(b"a") == cache.key(b"a")
+    assert cache.key(b"a") != cache.key(b"b")
+    assert cache.key(b"a") != other.key(b"a")
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = BuildCache(str(tmp_path), 1024 * 1024)
+    keys = [cache.key(bytes([i])) for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.put(key, {"body": "x" * 100})
+        os.utime(cache._path(key), (os.path.getmtime(cache._path(key)) - age,) * 2)
+
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = entry_size(cache, keys[0]) * 2
+    assert cache.prune() == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_prune_of_missing_directory(tmp_path):
+    assert BuildCache(str(tmp_path / "missing"), 0).prune() == 0
+
+
+def test_merger_reuses_cached_extractions(tmp_path):
+    cache = BuildCache(str(tmp_path), 1024 * 1024)
+    first = TabMerger(cache=cache)
+    result = first.merge([("a", REPORT), ("b", REPORT.replace("report", "other"))], str(tmp_path / "one.html"))
+    assert result.cache_hits == 0
+
+    result = TabMerger(cache=cache).merge([("a", REPORT)], str(tmp_path / "two.html"))
+    assert result.cache_hits == 1
+    assert "<p>report</p>" in (tmp_path / "two.html").read_text()
@@ -0,0 +1,46 @@
+import glob
+import os
+
+import pytest
+
+from htmltabs.htmltabs import discover_files
+
+FILES = ["x.html", "x.htm", "a/y.html", "a/b/z.html", "a/b/q.html", "c/w.htm", ".hidden/h.html"]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in FILES:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("<p>report</p>")
+    return str(tmp_path)
+
+
+def glob_files(directory: str, pattern: str, recursive: bool) -> set:
+    """What merge-html found before discovery moved to a scandir walk."""
+    if recursive:
+        found = glob.glob(os.path.join(directory, "**", pattern), recursive=True)
+    else:
+        found = glob.glob(os.path.join(directory, pattern))
+    return {os.path.normpath(path) for path in found if os.path.isfile(path)}
+
+
+@pytest.mark.parametrize("recursive", [False, True])
+@pytest.mark.parametrize(
+    "pattern", ["*.html", "*.htm*", "?.html", "[xy].html", "a/*.html", "*/*.html", "**/*.html", "a/**/*.html", "**"]
+)
+def test_discovery_matches_glob(tree, pattern, recursive):
+    found, _ = discover_files(tree, [pattern], [], recursive)
+    assert {os.path.normpath(path) for path, _ in found} == glob_files(tree, pattern, recursive)
+
+
+def test_recursive_double_star_includes_top_level_files(tree):
+    found, _ = discover_files(tree, ["**/*.html"], [], recursive=True)
+    assert os.path.join(tree, "x.html") in {os.path.normpath(path) for path, _ in found}
+
+
+def test_excludes_are_counted(tree):
+    found, excluded = discover_files(tree, ["*.html"], ["z.html", "a/y.html"], recursive=True)
+    assert {os.path.relpath(path, tree) for path, _ in found} == {"x.html", os.path.join("a", "b", "q.html")}
+    assert excluded == 2
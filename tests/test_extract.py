@@ -0,0 +1,43 @@
+import pytest
+
+from htmltabs.htmltabs import parse_html, scan_html
+
+# Written the way html.parser serializes it, with no whitespace between the
+# body's top-level nodes, so both extractors agree exactly
+DOCUMENT = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<title>Run 1</title>
+<link href="style.css" rel="stylesheet"/>
+<style>td { color: red; }</style>
+<script src="plot.js"></script>
+<script>var tag = "<body>";</script>
+</head>
+<body class="report"><h1>Run 1</h1><table><tr><td>98.2%</td></tr></table><script>draw("</body>");</script></body>
+</html>
+"""
+
+
+def test_scan_matches_parse():
+    assert scan_html(DOCUMENT) == parse_html(DOCUMENT)
+
+
+def test_fast_parser_matches_html_parser():
+    assert parse_html(DOCUMENT, parser="fast") == parse_html(DOCUMENT)
+
+
+def test_scan_keeps_head_assets_in_order():
+    assets, _ = scan_html(DOCUMENT)
+    assert assets == [
+        '<link href="style.css" rel="stylesheet"/>',
+        "<style>td { color: red; }</style>",
+        '<script src="plot.js"></script>',
+        '<script>var tag = "<body>";</script>',
+    ]
+
+
+@pytest.mark.parametrize("document", ["<p>no body tag</p>", "<html><head><title>x</title></head></html>"])
+def test_documents_without_body_fall_back_to_html_parser(document):
+    assert scan_html(document) is None
+    assert parse_html(document, parser="fast") == parse_html(document)
@@ -0,0 +1,71 @@
+import base64
+import gzip
+import io
+import re
+
+import pytest
+
+from htmltabs import MergeOptions, TabMerger
+
+REPORT = "<html><head><style>p { color: red; }</style></head><body><p>café report</p></body></html>"
+
+SOURCES = {
+    "str": lambda tmp_path: REPORT,
+    "bytes": lambda tmp_path: REPORT.encode("utf-8"),
+    "text file": lambda tmp_path: io.StringIO(REPORT),
+    "binary file": lambda tmp_path: io.BytesIO(REPORT.encode("utf-8")),
+    "path": lambda tmp_path: write_report(tmp_path / "report.html"),
+}
+
+
+def write_report(path):
+    path.write_text(REPORT, encoding="utf-8")
+    return path
+
+
+def payloads(page: str) -> list:
+    """Decompress the tab contents of a --compress page."""
+    return [
+        gzip.decompress(base64.b64decode(payload)).decode("utf-8")
+        for payload in re.findall(r'<script type="application/x-gzip-base64" class="htmltabs-payload">([^<]*)</script>', page)
+    ]
+
+
+@pytest.mark.parametrize("use_iframe", [False, True])
+@pytest.mark.parametrize("kind", SOURCES)
+def test_sources_render_the_same_page(tmp_path, kind, use_iframe):
+    expected = TabMerger(use_iframe=use_iframe).render([("Report", REPORT)])
+    assert TabMerger(use_iframe=use_iframe).render([("Report", SOURCES[kind](tmp_path))]) == expected
+    assert "café report" in expected
+
+
+@pytest.mark.parametrize("use_iframe", [False, True])
+def test_generator_of_tabs(use_iframe):
+    tabs = ((f"Run {i}", REPORT.replace("report", f"run {i}"), f"run-{i}.html") for i in range(3))
+    page = TabMerger(use_iframe=use_iframe).render(tabs)
+    assert page == TabMerger(use_iframe=use_iframe).render(
+        [(f"Run {i}", REPORT.replace("report", f"run {i}"), f"run-{i}.html") for i in range(3)]
+    )
+    for i in range(3):
+        assert f'data-tab="tab{i + 1}" title="run-{i}.html">Run {i}</button>' in page
+
+
+def test_merge_to_path_and_file(tmp_path):
+    out = io.StringIO()
+    result = TabMerger().merge([("a", REPORT), ("b", REPORT)], out)
+    TabMerger().merge([("a", REPORT), ("b", REPORT)], tmp_path / "merged.html")
+    assert (tmp_path / "merged.html").read_text(encoding="utf-8") == out.getvalue()
+    assert [stats.name for stats in result.files] == ["a", "b"]
+    # The shared style is only written once
+    assert out.getvalue().count("p { color: red; }") == 1
+
+
+@pytest.mark.parametrize("use_iframe", [False, True])
+def test_compress_implies_lazy_tabs(use_iframe):
+    assert MergeOptions(compress=True).lazy_tabs
+    page = TabMerger(use_iframe=use_iframe, compress=True).render([("a", REPORT), ("b", REPORT)])
+    assert "materializeTab" in page
+    contents = payloads(page)
+    assert len(contents) == 2
+    assert all("café report" in content for content in contents)
+    assert "café report" not in page
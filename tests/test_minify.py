@@ -0,0 +1,99 @@
+import pytest
+
+from htmltabs.htmltabs import HTMLMinifier, minify_html
+
+DOCUMENT = """<!DOCTYPE html>
+<html>
+<head>
+  <title>Report</title>
+  <style>
+    body  { margin: 0; }   /* keep me */
+  </style>
+  <!--[if IE]><link rel="stylesheet" href="ie.css"><![endif]-->
+</head>
+<body>
+  <!-- build 1234 -->
+  <div class="summary"   data-note='a > b'>
+    <p>Reads   mapped:
+       <b>98.2%</b>  of   total</p>
+    <a href="x.html" title="1 > 0  and  2 > 1">link</a>
+  </div>
+  <pre>
+    col1    col2
+      indented  <b>  bold  </b>
+  </pre>
+  <textarea name="notes">  two  spaces
+    and a newline  </textarea>
+  <script>
+    // a comment that stays
+    if (a  <  b) { document.write("<p>  hi  </p>"); }
+  </script>
+  <img alt="x  >  y"   src="plot.png">
+</body>
+</html>
+"""
+
+
+def minify_in_chunks(document: str, size: int) -> str:
+    minifier = HTMLMinifier()
+    parts = [minifier.feed(document[i:i + size]) for i in range(0, len(document), size)]
+    return "".join(parts) + minifier.close()
+
+
+def raw_contents(document: str, tag: str) -> str:
+    start = document.index(f"<{tag}")
+    start = document.index(">", start) + 1
+    return document[start:document.index(f"</{tag}>", start)]
+
+
+def test_minify_removes_whitespace_and_comments():
+    minified, saved = minify_html(DOCUMENT)
+    assert saved == len(DOCUMENT.encode('utf-8')) - len(minified.encode('utf-8')) > 0
+    assert "build 1234" not in minified
+    assert "<p>Reads mapped:\n<b>98.2%</b> of total</p>" in minified
+    assert "</div><pre>" in minified
+
+
+@pytest.mark.parametrize("size", [*range(1, 65), 100, 4096])
+def test_output_does_not_depend_on_chunk_size(size):
+    assert minify_in_chunks(DOCUMENT, size) == minify_html(DOCUMENT)[0]
+
+
+@pytest.mark.parametrize("tag", ["pre", "textarea", "script", "style"])
+def test_raw_element_contents_are_kept(tag):
+    minified, _ = minify_html(DOCUMENT)
+    assert raw_contents(minified, tag) == raw_contents(DOCUMENT, tag)
+
+
+def test_conditional_comments_are_kept():
+    minified, _ = minify_html(DOCUMENT)
+    assert '<!--[if IE]><link rel="stylesheet" href="ie.css"><![endif]-->' in minified
+
+
+def test_tags_with_quoted_gt_are_kept():
+    minified, _ = minify_html(DOCUMENT)
+    assert """<div class="summary"   data-note='a > b'>""" in minified
+    assert '<a href="x.html" title="1 > 0  and  2 > 1">' in minified
+    assert '<img alt="x  >  y"   src="plot.png">' in minified
+
+
+ATTRIBUTE_DOCUMENTS = [
+    '<p>keep</p><a title="x <!-- y">link</a> <p>lost?</p> <!-- real --> <p>tail</p>',
+    '<div title="a    b <script>">  x   y  </div>  <p>  z  </p>',
+]
+
+
+@pytest.mark.parametrize("size", [*range(1, 65), 100, 4096])
+@pytest.mark.parametrize("document", ATTRIBUTE_DOCUMENTS)
+def test_comment_and_raw_openers_inside_attributes_are_text(document, size):
+    assert minify_in_chunks(document, size) == minify_html(document)[0]
+
+
+def test_comment_opener_inside_attribute_keeps_following_markup():
+    minified, _ = minify_html(ATTRIBUTE_DOCUMENTS[0])
+    assert minified == '<p>keep</p><a title="x <!-- y">link</a><p>lost?</p><p>tail</p>'
+
+
+def test_raw_opener_inside_attribute_keeps_value_and_minifying():
+    minified, _ = minify_html(ATTRIBUTE_DOCUMENTS[1])
+    assert minified == '<div title="a    b <script>">x y</div><p>z</p>'